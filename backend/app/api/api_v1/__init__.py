@@ -3,7 +3,9 @@ from fastapi.responses import Response
 
 from config import settings
 
+from .internal import router as internal_router
 from .payment import router as payment_router
+from .payment_status import router as payment_status_router
 from .qr_payment import router as qr_payment_router
 from .reviews_2gis import router as reviews_2gis_router
 
@@ -14,6 +16,10 @@ router.include_router(
     payment_router,
     prefix=settings.api.v1.payments
 )
+router.include_router(
+    payment_status_router,
+    prefix=settings.api.v1.payments
+)
 router.include_router(
     qr_payment_router,
     prefix=settings.api.v1.qr_payments
@@ -22,6 +28,10 @@ router.include_router(
     reviews_2gis_router,
     prefix='/2gis'
 )
+router.include_router(
+    internal_router,
+    prefix='/internal'
+)
 
 @router.head("/health", tags=["system"])
 async def health_check():
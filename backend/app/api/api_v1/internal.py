@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+
+from http_clients import breakers
+from utils.dependencies_for_docs import get_current_user_for_docs
+
+router = APIRouter(
+    tags=["system"],
+    dependencies=[Depends(get_current_user_for_docs)],
+)
+
+
+@router.get("/breakers")
+async def get_breakers():
+    return {"breakers": breakers.as_list()}
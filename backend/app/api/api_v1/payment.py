@@ -1,7 +1,37 @@
-import asyncio
+import hashlib
+import logging
+
 import httpx
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field, HttpUrl
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, HttpUrl, model_validator
+
+from config import settings
+from http_clients import CircuitOpenError, get_bank_client, send_with_retry
+from http_clients.throttle import host_limiters
+from services import (
+    BankTokenError,
+    BankTokenProvider,
+    IdempotencyConflict,
+    IdempotencyInProgress,
+    IdempotencyStore,
+    MqttPublisher,
+    Outbox,
+    OutboxConflict,
+    OutboxJob,
+    OutboxWorker,
+    RetryLater,
+    UnknownMerchant,
+    gather_batch,
+    get_bank_tokens,
+    get_idempotency_store,
+    get_outbox,
+    iter_batch,
+    payload_fingerprint,
+)
+from utils.ndjson import ndjson_response
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(tags=["payments"])
 
@@ -11,7 +41,49 @@ class PaymentRequest(BaseModel):
     transaction_id: str
     comment: str
     redirect_url: str
-    token: str = Field(min_length=1)
+    # Либо сырой токен Бакай, либо мерчант, чей токен сервис получит сам
+    token: str | None = Field(default=None, min_length=1)
+    merchant_id: str | None = Field(default=None, min_length=1)
+
+    @model_validator(mode="after")
+    def check_credentials(self):
+        if (self.token is None) == (self.merchant_id is None):
+            raise ValueError("Укажите либо token, либо merchant_id")
+        return self
+
+
+def payment_key(data: PaymentRequest) -> str:
+    """
+    Ключ идемпотентности платежа.
+
+    transaction_id уникален только у своего мерчанта, поэтому ключ включает
+    merchant_id или хеш токена — сам токен в ключ не попадает.
+    """
+    if data.merchant_id is not None:
+        scope = f"merchant:{data.merchant_id}"
+    else:
+        scope = "token:" + hashlib.sha256(data.token.encode()).hexdigest()[:32]
+    return f"paylink:{scope}:{data.transaction_id}"
+
+
+def payment_fingerprint(data: PaymentRequest) -> str:
+    # Токен уже учтён в ключе; в отпечаток, который хранится рядом с результатом, не пишем
+    return payload_fingerprint(data.model_dump(exclude={"token"}))
+
+
+class PaymentBatchRequest(BaseModel):
+    items: list[PaymentRequest] = Field(min_length=1, max_length=settings.batch.max_items)
+
+
+CREATE_PAY_LINK_URL = f"{settings.upstreams.bank}/api/PayLink/CreatePayLink"
+
+
+class BankRejected(Exception):
+    """Банк ответил ошибкой; status_code — код его ответа."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Банк ответил HTTP {status_code}")
+        self.status_code = status_code
 
 
 async def generate_payment_link_async(
@@ -19,7 +91,8 @@ async def generate_payment_link_async(
     transaction_id: str,
     comment: str,
     redirect_url: str,
-    token: str
+    token: str,
+    client: httpx.AsyncClient,
 ) -> str | None:
     payload = {
         "amount": amount,
@@ -32,37 +105,241 @@ async def generate_payment_link_async(
         "Accept": "*/*",
         "Authorization": f"Bearer {token}"
     }
-    url = "https://openbanking-api.bakai.kg/api/PayLink/CreatePayLink"
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(url, json=payload, headers=headers)
-            if response.status_code == 200 and response.text.strip().startswith("http"):
-                return response.text.strip()
-            # Если банк ответил ошибкой — не повторять
-            break
-        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(2)
-            continue
-        except Exception as e:
-            break
+    url = CREATE_PAY_LINK_URL
+    try:
+        response = await send_with_retry(
+            client,
+            "POST",
+            url,
+            upstream=settings.http.bank,
+            json=payload,
+            headers=headers,
+        )
+    except httpx.TimeoutException:
+        # Таймаут или исчерпанный дедлайн запроса — create_payment_link отдаст 504
+        raise
+    except httpx.TransportError:
+        # Нет связи — запрос можно повторить позже
+        return None
+    if response.status_code != 200:
+        raise BankRejected(response.status_code)
+    if response.text.strip().startswith("http"):
+        return response.text.strip()
     return None
 
 
-@router.post("/make-payment-link/")
-async def make_payment_link(data: PaymentRequest):
-    link = await generate_payment_link_async(
-        transaction_id=data.transaction_id,
-        amount=data.amount,
-        comment=data.comment,
-        redirect_url=data.redirect_url,
-        token=data.token
-    )
+async def resolve_bank_token(data: PaymentRequest, tokens: BankTokenProvider | None) -> str:
+    if data.token is not None:
+        return data.token
+    if tokens is None:
+        raise HTTPException(status_code=404, detail=f"Неизвестный merchant_id: {data.merchant_id}")
+    try:
+        return await tokens.get(data.merchant_id)
+    except UnknownMerchant:
+        raise HTTPException(status_code=404, detail=f"Неизвестный merchant_id: {data.merchant_id}")
+    except BankTokenError:
+        raise HTTPException(
+            status_code=502,
+            detail="Не удалось получить токен доступа банка. Попробуйте ещё раз через пару минут."
+        )
+
+
+async def create_payment_link(
+    data: PaymentRequest,
+    client: httpx.AsyncClient,
+    idempotency: IdempotencyStore | None,
+    tokens: BankTokenProvider | None = None,
+) -> tuple[str, bool]:
+    """
+    Возвращает (pay_url, повторный_ли_это_ответ) или бросает HTTPException.
+    """
+    async def send(token: str):
+        return await generate_payment_link_async(
+            transaction_id=data.transaction_id,
+            amount=data.amount,
+            comment=data.comment,
+            redirect_url=data.redirect_url,
+            token=token,
+            client=client,
+        )
+
+    async def create_link():
+        token = await resolve_bank_token(data, tokens)
+        try:
+            return await send(token)
+        except BankRejected as e:
+            if e.status_code not in (401, 403) or data.merchant_id is None or tokens is None:
+                raise
+            # Банк отозвал закэшированный токен мерчанта раньше срока — берём новый и пробуем ещё раз
+            log.warning("Bank rejected token for merchant %s (HTTP %s), refreshing", data.merchant_id, e.status_code)
+            tokens.invalidate(data.merchant_id, token)
+            return await send(await resolve_bank_token(data, tokens))
+
+    replayed = False
+    try:
+        if idempotency is None:
+            link = await create_link()
+        else:
+            link, replayed = await idempotency.run(
+                key=payment_key(data),
+                fingerprint=payment_fingerprint(data),
+                call=create_link,
+            )
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=409,
+            detail="transaction_id уже использован с другими параметрами платежа."
+        )
+    except IdempotencyInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="Платёж с этим transaction_id ещё обрабатывается. Повторите запрос позже."
+        )
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=504,
+            detail="Банк не ответил вовремя. Попробуйте ещё раз через пару минут."
+        )
+    except BankRejected as e:
+        if e.status_code < 500:
+            # Повтор с теми же параметрами получит тот же отказ
+            raise HTTPException(
+                status_code=422,
+                detail=f"Банк отклонил запрос (HTTP {e.status_code}). Проверьте параметры платежа."
+            )
+        link = None
     if link:
-        return {"pay_url": link}
+        return link, replayed
     raise HTTPException(
         status_code=502,
         detail="Банк временно недоступен или произошла ошибка связи. Попробуйте ещё раз через пару минут."
     )
+
+
+async def run_payment_job(
+    job: OutboxJob,
+    client: httpx.AsyncClient,
+    idempotency: IdempotencyStore | None,
+    tokens: BankTokenProvider | None,
+) -> dict:
+    data = PaymentRequest.model_validate(job.payload)
+    try:
+        link, _ = await create_payment_link(data, client, idempotency, tokens)
+    except CircuitOpenError as e:
+        raise RetryLater(str(e), delay=e.retry_after)
+    except HTTPException as e:
+        # Повторяем нет связи, 5xx банка (502/503) и таймауты (504);
+        # отказ банка на 4xx (422) и неизвестный мерчант завершают задачу сразу
+        if e.status_code in (502, 503, 504):
+            raise RetryLater(e.detail)
+        raise
+    return {"transaction_id": data.transaction_id, "pay_url": link}
+
+
+def job_view(job: OutboxJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "transaction_id": job.payload.get("transaction_id"),
+        "pay_url": (job.result or {}).get("pay_url"),
+        "error": job.error,
+    }
+
+
+def build_payment_outbox_worker(outbox: Outbox, state) -> OutboxWorker:
+    """Разбор отложенных платёжных ссылок; результат уходит в MQTT-топик мерчанта."""
+    publisher: MqttPublisher | None = getattr(state, "mqtt_publisher", None)
+
+    async def handler(job: OutboxJob) -> dict:
+        return await run_payment_job(
+            job,
+            client=state.http_clients.bank,
+            idempotency=getattr(state, "idempotency", None),
+            tokens=getattr(state, "bank_tokens", None),
+        )
+
+    async def on_finished(job: OutboxJob) -> None:
+        merchant_id = job.payload.get("merchant_id")
+        if publisher is None or merchant_id is None:
+            return
+        await publisher.publish(publisher.topic_for(merchant_id, "links"), job_view(job))
+
+    return OutboxWorker(outbox, handler=handler, on_finished=on_finished)
+
+
+async def enqueue_payment_link(data: PaymentRequest, outbox: Outbox | None) -> OutboxJob:
+    if outbox is None:
+        raise HTTPException(status_code=400, detail="Асинхронный режим выключен.")
+    if data.token is not None:
+        # Задача лежит в SQLite до выполнения, сырой токен банка туда не пишем:
+        # воркер получит токен мерчанта через BankTokenProvider
+        raise HTTPException(
+            status_code=400,
+            detail="Асинхронный режим доступен только с merchant_id, без token."
+        )
+    try:
+        job, created = await outbox.enqueue(
+            dedupe_key=payment_key(data),
+            fingerprint=payment_fingerprint(data),
+            payload=data.model_dump(exclude={"token"}),
+        )
+    except OutboxConflict:
+        raise HTTPException(
+            status_code=409,
+            detail="transaction_id уже использован с другими параметрами платежа."
+        )
+    if created:
+        log.info("Payment link %s queued as job %s", data.transaction_id, job.id)
+    return job
+
+
+@router.post("/make-payment-link/")
+async def make_payment_link(
+    data: PaymentRequest,
+    request: Request,
+    response: Response,
+    # ?async=true — не ждать банк: принять запрос в outbox и вернуть 202 с job_id
+    async_mode: bool = Query(False, alias="async"),
+    client: httpx.AsyncClient = Depends(get_bank_client),
+    idempotency: IdempotencyStore | None = Depends(get_idempotency_store),
+    tokens: BankTokenProvider | None = Depends(get_bank_tokens),
+    outbox: Outbox | None = Depends(get_outbox),
+):
+    if async_mode:
+        job = await enqueue_payment_link(data, outbox)
+        status_url = str(request.url_for("get_payment_job", job_id=job.id))
+        response.status_code = 202
+        response.headers["Location"] = status_url
+        return {**job_view(job), "status_url": status_url}
+
+    link, replayed = await create_payment_link(data, client, idempotency, tokens)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return {"pay_url": link}
+
+
+@router.post("/make-payment-link/batch/")
+async def make_payment_links_batch(
+    data: PaymentBatchRequest,
+    stream: bool = False,
+    client: httpx.AsyncClient = Depends(get_bank_client),
+    idempotency: IdempotencyStore | None = Depends(get_idempotency_store),
+    tokens: BankTokenProvider | None = Depends(get_bank_tokens),
+):
+    async def handle(item: PaymentRequest) -> dict:
+        link, replayed = await create_payment_link(item, client, idempotency, tokens)
+        return {"transaction_id": item.transaction_id, "pay_url": link, "replayed": replayed}
+
+    limiter = host_limiters.get(httpx.URL(CREATE_PAY_LINK_URL).host, settings.batch)
+    if stream:
+        return ndjson_response(iter_batch(data.items, handle, limiter))
+    return ORJSONResponse({"results": await gather_batch(data.items, handle, limiter)})
+
+
+@router.get("/jobs/{job_id}/")
+async def get_payment_job(job_id: str, outbox: Outbox | None = Depends(get_outbox)):
+    job = await outbox.get(job_id) if outbox is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job_view(job)
@@ -0,0 +1,80 @@
+import logging
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from pydantic import BaseModel, ConfigDict, Field
+
+from config import settings
+from services import (
+    MqttPublisher,
+    PublisherBusy,
+    get_mqtt_publisher,
+    get_status_dedupe,
+    verify_signature,
+)
+from services.idempotency import IdempotencyBackend
+
+log = logging.getLogger(__name__)
+
+router = APIRouter(tags=["payment-status"])
+
+
+class PaymentStatusNotification(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    transaction_id: str = Field(min_length=1)
+    status: str = Field(min_length=1)
+    amount: float | None = None
+
+
+@router.post("/callback/{merchant_id}/")
+async def payment_status_callback(
+    request: Request,
+    data: PaymentStatusNotification,
+    # Без "/", "+" и "#", чтобы мерчант не мог писать в чужие топики
+    merchant_id: str = Path(pattern=r"^[\w-]{1,64}$"),
+    publisher: MqttPublisher | None = Depends(get_mqtt_publisher),
+    dedupe: IdempotencyBackend = Depends(get_status_dedupe),
+):
+    secret = settings.payment_status.callback_secret
+    if secret is None or not secret.get_secret_value():
+        # Без секрета подпись не проверить: не принимаем ничего, иначе любой
+        # может опубликовать чужой статус и занять ключ дедупликации
+        log.error("Payment status callback rejected: callback_secret is not configured")
+        raise HTTPException(status_code=503, detail="Приём уведомлений не настроен")
+    config = settings.payment_status
+    # verify_signature сравнивает через hmac.compare_digest и отклоняет устаревший timestamp
+    if not verify_signature(
+        await request.body(),
+        request.headers.get(config.signature_header),
+        secret.get_secret_value(),
+        merchant_id=merchant_id,
+        timestamp=request.headers.get(config.timestamp_header),
+        tolerance=config.signature_tolerance,
+    ):
+        raise HTTPException(status_code=401, detail="Неверная подпись уведомления")
+
+    key = f"status:{merchant_id}:{data.transaction_id}:{data.status}"
+    if not await dedupe.reserve(key, fingerprint="", ttl=settings.payment_status.dedupe_ttl):
+        return {"status": "duplicate"}
+
+    if publisher is None:
+        log.warning("MQTT disabled, payment status %s for %s not published", data.status, data.transaction_id)
+        return {"status": "accepted", "published": False}
+
+    message = {
+        **data.model_dump(),
+        "merchant_id": merchant_id,
+        "received_at": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        await publisher.publish(publisher.topic_for(merchant_id), message)
+    except PublisherBusy:
+        # Снимаем отметку, чтобы повтор банка не посчитался дублем
+        await dedupe.release(key)
+        raise HTTPException(
+            status_code=503,
+            detail="Очередь уведомлений переполнена. Повторите позже.",
+            headers={"Retry-After": "5"},
+        )
+    return {"status": "accepted", "published": True}
@@ -1,10 +1,37 @@
-import asyncio
+import logging
+import time
+from email.utils import formatdate
+
 import httpx
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field, HttpUrl
 
+from config import settings
+from http_cache import etag_matches
+from http_clients import CircuitOpenError, get_qr_client, send_with_retry
+from http_clients.throttle import host_limiters
+from services import (
+    ByteLRUCache,
+    SingleFlightCache,
+    gather_batch,
+    get_qr_cache,
+    get_qr_image_cache,
+    iter_batch,
+    payload_fingerprint,
+)
+from services.qr_image import MEDIA_TYPES, ImageFormat, image_key, render_qr
+from utils.ndjson import ndjson_response
+
+log = logging.getLogger(__name__)
+
 router = APIRouter(tags=["qr-payments"])
 
+QR_UNAVAILABLE_DETAIL = "QR-сервис временно недоступен. Попробуйте позже."
+QR_TIMEOUT_DETAIL = "QR-сервис не ответил вовремя. Попробуйте позже."
+
 
 class QRPaymentRequest(BaseModel):
     account_number: str = Field(..., pattern=r"^124\d+", description="Счёт, начинающийся с 124")
@@ -19,12 +46,24 @@ class QRPaymentRequest(BaseModel):
     fail_url: HttpUrl | None = None
 
 
+class QRPaymentBatchRequest(BaseModel):
+    items: list[QRPaymentRequest] = Field(min_length=1, max_length=settings.batch.max_items)
+
+
+def qr_base_url(test_mode: bool) -> str:
+    return settings.upstreams.qr_test if test_mode else settings.upstreams.qr
+
+
 async def generate_qr_payment_link_async(
     data: QRPaymentRequest,
+    client: httpx.AsyncClient,
     test_mode: bool = True
-) -> dict | None:
-    url_base = "https://qrpay-test.bakai.kg" if test_mode else "https://qrpay.bakai.kg"
-    url = f"{url_base}/api/v1/qr/generate"
+) -> bytes | None:
+    """
+    Возвращает тело ответа банка как есть: JSON не разбираем и не собираем
+    заново, а отдаём клиенту байты, полученные от банка.
+    """
+    url = f"{qr_base_url(test_mode)}/api/v1/qr/generate"
 
     payload = {
         "account_number": data.account_number,
@@ -46,41 +85,154 @@ async def generate_qr_payment_link_async(
         "Accept": "application/json",
     }
 
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(url, json=payload, headers=headers)
-
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code in (400, 404, 409, 500):
-                # Ошибка со стороны банка — не повторяем
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=response.json()
-                )
+    try:
+        response = await send_with_retry(
+            client,
+            "POST",
+            url,
+            upstream=settings.http.qr,
+            json=payload,
+            headers=headers,
+        )
+    except CircuitOpenError:
+        raise
+    except (httpx.ConnectError, httpx.ConnectTimeout):
+        return None
+    except httpx.TimeoutException:
+        # В том числе исчерпанный дедлайн запроса (send_with_retry)
+        raise HTTPException(status_code=504, detail=QR_TIMEOUT_DETAIL)
+    except httpx.TransportError:
+        log.warning("QR request to %s failed", url, exc_info=True)
+        raise HTTPException(status_code=502, detail=QR_UNAVAILABLE_DETAIL)
+    except Exception:
+        # Текст исключения может содержать адрес апстрима — клиенту не отдаём
+        log.exception("QR request to %s failed", url)
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервиса")
+
+    if response.status_code == 200:
+        if "json" not in response.headers.get("content-type", ""):
             raise HTTPException(
                 status_code=502,
                 detail=f"Unexpected response: {response.text}"
             )
+        return response.content
+    elif response.status_code in (400, 404, 409, 500):
+        # Ошибка со стороны банка — не повторяем
+        try:
+            detail = response.json()
+        except ValueError:
+            detail = response.text
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=detail
+        )
+    raise HTTPException(
+        status_code=502,
+        detail=f"Unexpected response: {response.text}"
+    )
 
-        except (httpx.ConnectError, httpx.ConnectTimeout):
-            if attempt < max_retries - 1:
-                await asyncio.sleep(2)
-            continue
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    return None
 
+async def generate_qr_cached(
+    data: QRPaymentRequest,
+    client: httpx.AsyncClient,
+    test_mode: bool,
+    cache: SingleFlightCache | None,
+) -> tuple[bytes, str, float | None]:
+    """
+    Одинаковые одновременные запросы делят один вызов банка, а готовый QR
+    переиспользуется, пока не истечёт его ttl.
+    Возвращает (тело ответа банка, hit/shared/miss, когда QR истекает)
+    или бросает HTTPException.
+    """
+    async def generate():
+        result = await generate_qr_payment_link_async(data, client, test_mode=test_mode)
+        if result is None:
+            return None
+        # Срок считаем от создания QR: из кэша он отдаётся уже не с полным ttl
+        return result, (time.time() + data.ttl if data.ttl else None)
 
-@router.post("/generate-qr/")
-async def generate_qr(data: QRPaymentRequest, test_mode: bool = True):
-    result = await generate_qr_payment_link_async(data, test_mode=test_mode)
-    if result:
-        return result
+    # Без transaction_id одинаковые запросы — разные платежи, один QR на них делить нельзя
+    if cache is None or data.transaction_id is None:
+        generated, outcome = await generate(), "miss"
+    else:
+        key = payload_fingerprint({**data.model_dump(mode="json"), "test_mode": test_mode})
+        generated, outcome = await cache.get_or_call(
+            key,
+            generate,
+            ttl_for=lambda _: (data.ttl or 0) - settings.qr_cache.ttl_margin,
+        )
+    if generated:
+        result, expires_at = generated
+        return result, outcome, expires_at
     raise HTTPException(
         status_code=502,
-        detail="QR-сервис временно недоступен. Попробуйте позже."
+        detail=QR_UNAVAILABLE_DETAIL
     )
+
+
+@router.post("/generate-qr/")
+async def generate_qr(
+    data: QRPaymentRequest,
+    test_mode: bool = True,
+    client: httpx.AsyncClient = Depends(get_qr_client),
+    cache: SingleFlightCache | None = Depends(get_qr_cache),
+):
+    result, outcome, expires_at = await generate_qr_cached(data, client, test_mode, cache)
+    headers = {"X-QR-Cache": outcome}
+    if expires_at is not None:
+        headers["X-QR-Expires"] = formatdate(expires_at, usegmt=True)
+    return Response(content=result, media_type="application/json", headers=headers)
+
+
+@router.post("/generate-qr/batch/")
+async def generate_qr_batch(
+    data: QRPaymentBatchRequest,
+    test_mode: bool = True,
+    stream: bool = False,
+    client: httpx.AsyncClient = Depends(get_qr_client),
+    cache: SingleFlightCache | None = Depends(get_qr_cache),
+):
+    async def handle(item: QRPaymentRequest) -> dict:
+        result, outcome, expires_at = await generate_qr_cached(item, client, test_mode, cache)
+        # Fragment вставляет тело ответа банка в итоговый JSON без разбора
+        return {
+            "transaction_id": item.transaction_id,
+            "result": orjson.Fragment(result),
+            "cache": outcome,
+            "expires_at": int(expires_at) if expires_at is not None else None,
+        }
+
+    limiter = host_limiters.get(httpx.URL(qr_base_url(test_mode)).host, settings.batch)
+    if stream:
+        return ndjson_response(iter_batch(data.items, handle, limiter))
+    return ORJSONResponse({"results": await gather_batch(data.items, handle, limiter)})
+
+
+@router.get("/qr-image/")
+async def get_qr_image(
+    data: str = Query(min_length=1, max_length=settings.qr_image.max_data_length, description="Содержимое QR от банка"),
+    size: int = Query(256, description="Сторона в пикселях, одно из settings.qr_image.sizes"),
+    image_format: ImageFormat = Query("png", alias="format"),
+    cache: ByteLRUCache = Depends(get_qr_image_cache),
+    if_none_match: str | None = Header(None),
+):
+    if size not in settings.qr_image.sizes:
+        raise HTTPException(
+            status_code=422,
+            detail=f"size должен быть одним из {settings.qr_image.sizes}"
+        )
+
+    key = image_key(data, size, image_format)
+    # Картинка однозначно задаётся URL — её можно кэшировать навсегда
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    image = cache.get(key)
+    if image is None:
+        image = await run_in_threadpool(render_qr, data, size, image_format, settings.qr_image)
+        cache.set(key, image)
+    return Response(content=image, media_type=MEDIA_TYPES[image_format], headers=headers)
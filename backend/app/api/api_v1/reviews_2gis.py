@@ -1,55 +1,273 @@
+import asyncio
+import hashlib
+import logging
+
 import httpx
-from fastapi import APIRouter
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+
 from config import settings
+from http_cache import etag_matches, negotiated_response
+from http_clients import get_gis_client
+from services import ReviewAggregates, ReviewsCache, ReviewsSnapshot, get_reviews_caches
+from services.review_stats import merge_aggregates
+from services.reviews_2gis import (
+    aggregate_reviews,
+    build_snapshot,
+    decode_cursor,
+    encode_cursor,
+    fetch_five_star_reviews,
+    interleave,
+    iter_review_pages,
+    merge_snapshots,
+    stream_five_star_reviews,
+)
+from utils.ndjson import STREAM_HEADERS
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(tags=["2gis"])
 
-# === Ваша конфигурация ===
-ORG_ID = "70000001051350763"
-API_KEY = settings.API_KEY_2GIS
-
-REVIEWS_URL = f"https://public-api.reviews.2gis.com/2.0/orgs/{ORG_ID}/reviews"
-FIRST_PARAMS = {
-    "key": API_KEY,
-    "rated": "true",
-    "limit": 50,
-    "sort_by": "date_created",
-    "fields": "meta.org_rating,meta.org_reviews_count"
-}
-
-async def fetch_five_star_reviews():
-    async with httpx.AsyncClient() as client:
-        reviews_5 = []
-
-        resp = await client.get(REVIEWS_URL, params=FIRST_PARAMS)
-        resp.raise_for_status()
-        data = resp.json()
-
-        while True:
-            for r in data.get("reviews", []):
-                if r.get("rating") == 5:
-                    reviews_5.append({
-                        "id": r.get("id"),
-                        "date_created": r.get("date_created"),
-                        "date_edited": r.get("date_edited"),
-                        "rating": r.get("rating"),
-                        "text": (r.get("text") or "").replace("\n", " "),
-                        "user_name": r.get("user", {}).get("name"),
-                        "comments_count": r.get("comments_count"),
-                        "official_answer": (r.get("official_answer") or {}).get("text"),
-                    })
-
-            next_link = data.get("meta", {}).get("next_link")
-            if not next_link:
-                break
-
-            resp = await client.get(next_link)
-            resp.raise_for_status()
-            data = resp.json()
-
-    return reviews_5
+UPSTREAM_ERROR_DETAIL = "2GIS временно недоступен. Попробуйте позже."
+
+
+def resolve_orgs(org_ids: list[str] | None) -> list[str]:
+    config = settings.gis_reviews
+    if not org_ids:
+        return config.orgs[:1]
+    orgs = list(dict.fromkeys(org_ids))
+    if len(orgs) > config.max_orgs_per_request:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {config.max_orgs_per_request} организаций за запрос",
+        )
+    unknown = [org_id for org_id in orgs if org_id not in config.orgs]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Неизвестная организация: {', '.join(unknown)}")
+    return orgs
+
+
+async def load_snapshot(
+    client: httpx.AsyncClient,
+    org_id: str,
+    caches: dict[str, ReviewsCache] | None,
+) -> ReviewsSnapshot:
+    cache = caches.get(org_id) if caches else None
+    if cache is not None:
+        return await cache.get()
+    reviews = await fetch_five_star_reviews(client, org_id)
+    return build_snapshot(reviews, newest_date=None)
+
+
+async def load_aggregates(
+    client: httpx.AsyncClient,
+    org_id: str,
+    caches: dict[str, ReviewsCache] | None,
+) -> ReviewAggregates:
+    cache = caches.get(org_id) if caches else None
+    if cache is not None:
+        aggregates = await cache.get_aggregates()
+        if aggregates is not None:
+            return aggregates
+    return await aggregate_reviews(client, org_id, settings.reviews_cache.aggregates_top_n)
+
+
+async def open_pages(client: httpx.AsyncClient, org_id: str):
+    pages = iter_review_pages(client, org_id, rating=5)
+    # Первую страницу берём до ответа, чтобы отдать 502, а не обрывать поток
+    first_page = await anext(pages)
+
+    async def replay_pages():
+        try:
+            yield first_page
+            async for page in pages:
+                yield page
+        finally:
+            await pages.aclose()
+
+    return replay_pages()
+
+
+async def stream_ndjson(client: httpx.AsyncClient, orgs: list[str], limit: int | None, cursor):
+    opened = await asyncio.gather(
+        *(open_pages(client, org_id) for org_id in orgs),
+        return_exceptions=True,
+    )
+    errors = [r for r in opened if isinstance(r, BaseException)]
+    if errors:
+        for pages in opened:
+            if not isinstance(pages, BaseException):
+                await pages.aclose()
+        if all(isinstance(e, httpx.HTTPError) for e in errors):
+            raise HTTPException(status_code=502, detail=UPSTREAM_ERROR_DETAIL)
+        raise errors[0]
+    org_pages = opened
+
+    # На отзыв больше limit: по нему видно, нужен ли next_cursor
+    streams = [
+        stream_five_star_reviews(pages, org_id=org_id, limit=limit and limit + 1, cursor=cursor)
+        for org_id, pages in zip(orgs, org_pages)
+    ]
+    # Несколько организаций читаются параллельно, отзывы идут по мере готовности
+    reviews = streams[0] if len(streams) == 1 else interleave(streams)
+
+    async def body():
+        sent = 0
+        last = None
+        try:
+            async for review in reviews:
+                if limit is not None and sent >= limit:
+                    # Есть ещё отзывы — последней строкой курсор на продолжение
+                    yield orjson.dumps({"next_cursor": encode_cursor(last)}) + b"\n"
+                    break
+                yield orjson.dumps(review) + b"\n"
+                sent += 1
+                last = review
+        except httpx.HTTPError:
+            log.warning("2GIS stream interrupted", exc_info=True)
+            # Статус 200 уже ушёл: последней строкой сообщаем, что список неполный
+            yield orjson.dumps({"error": "upstream", "detail": UPSTREAM_ERROR_DETAIL}) + b"\n"
+        finally:
+            await reviews.aclose()
+            for pages in org_pages:
+                await pages.aclose()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=STREAM_HEADERS)
+
+
+async def five_star_reviews_response(
+    request: Request,
+    orgs: list[str],
+    limit: int | None,
+    cursor: str | None,
+    stream: bool,
+    client: httpx.AsyncClient,
+    caches: dict[str, ReviewsCache] | None,
+    if_none_match: str | None,
+) -> Response:
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+
+    if stream:
+        if limit is not None and len(orgs) > 1:
+            # Потоки организаций сливаются в порядке готовности, а не по дате,
+            # поэтому курсор на продолжение для них не построить
+            raise HTTPException(status_code=400, detail="stream с limit — только для одной организации")
+        return await stream_ndjson(client, orgs, limit, position)
+
+    try:
+        snapshots = await asyncio.gather(*(load_snapshot(client, org_id, caches) for org_id in orgs))
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail=UPSTREAM_ERROR_DETAIL)
+    snapshot = merge_snapshots(snapshots)
+
+    if limit is None and position is None:
+        return negotiated_response(request, snapshot.body, snapshot.gzipped, {"ETag": snapshot.etag})
+
+    # У каждой страницы своё тело, значит и свой ETag
+    page_key = f"{snapshot.etag}:{limit}:{cursor}"
+    headers = {"ETag": '"%s"' % hashlib.sha1(page_key.encode()).hexdigest()}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    reviews, next_cursor = snapshot.page(limit, position)
+    return ORJSONResponse(
+        {"5_star_reviews": reviews, "next_cursor": next_cursor},
+        headers=headers,
+    )
+
 
 @router.get("/five-star-reviews")
-async def get_five_star_reviews():
-    reviews = await fetch_five_star_reviews()
-    return {"5_star_reviews": reviews}
+async def get_five_star_reviews(
+    request: Request,
+    org_id: list[str] | None = Query(
+        None,
+        description="Организации из разрешённого списка; без параметра — организация по умолчанию",
+    ),
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    stream: bool = Query(False, description="Отдавать отзывы построчно в NDJSON по мере загрузки из 2GIS"),
+    client: httpx.AsyncClient = Depends(get_gis_client),
+    caches: dict[str, ReviewsCache] | None = Depends(get_reviews_caches),
+    if_none_match: str | None = Header(None),
+):
+    return await five_star_reviews_response(
+        request, resolve_orgs(org_id), limit, cursor, stream, client, caches, if_none_match,
+    )
+
+
+@router.get("/orgs/{org_id}/five-star-reviews")
+async def get_org_five_star_reviews(
+    request: Request,
+    org_id: str = Path(description="Организация из разрешённого списка"),
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    stream: bool = Query(False, description="Отдавать отзывы построчно в NDJSON по мере загрузки из 2GIS"),
+    client: httpx.AsyncClient = Depends(get_gis_client),
+    caches: dict[str, ReviewsCache] | None = Depends(get_reviews_caches),
+    if_none_match: str | None = Header(None),
+):
+    return await five_star_reviews_response(
+        request, resolve_orgs([org_id]), limit, cursor, stream, client, caches, if_none_match,
+    )
+
+
+async def review_aggregates_response(
+    orgs: list[str],
+    latest: int | None,
+    client: httpx.AsyncClient,
+    caches: dict[str, ReviewsCache] | None,
+    if_none_match: str | None,
+) -> Response:
+    try:
+        parts = await asyncio.gather(*(load_aggregates(client, org_id, caches) for org_id in orgs))
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail=UPSTREAM_ERROR_DETAIL)
+
+    body = orjson.dumps(merge_aggregates(parts).as_dict(latest))
+    headers = {"ETag": '"%s"' % hashlib.sha1(body).hexdigest()}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/review-aggregates")
+async def get_review_aggregates(
+    org_id: list[str] | None = Query(
+        None,
+        description="Организации из разрешённого списка; без параметра — организация по умолчанию",
+    ),
+    latest: int | None = Query(
+        None,
+        ge=1,
+        le=settings.reviews_cache.aggregates_top_n,
+        description="Сколько последних отзывов отдавать по каждой оценке",
+    ),
+    client: httpx.AsyncClient = Depends(get_gis_client),
+    caches: dict[str, ReviewsCache] | None = Depends(get_reviews_caches),
+    if_none_match: str | None = Header(None),
+):
+    """
+    Гистограмма оценок, число отзывов по месяцам, доля отзывов
+    с официальным ответом и последние отзывы по каждой оценке.
+    """
+    return await review_aggregates_response(resolve_orgs(org_id), latest, client, caches, if_none_match)
+
+
+@router.get("/orgs/{org_id}/review-aggregates")
+async def get_org_review_aggregates(
+    org_id: str = Path(description="Организация из разрешённого списка"),
+    latest: int | None = Query(
+        None,
+        ge=1,
+        le=settings.reviews_cache.aggregates_top_n,
+        description="Сколько последних отзывов отдавать по каждой оценке",
+    ),
+    client: httpx.AsyncClient = Depends(get_gis_client),
+    caches: dict[str, ReviewsCache] | None = Depends(get_reviews_caches),
+    if_none_match: str | None = Header(None),
+):
+    return await review_aggregates_response(resolve_orgs([org_id]), latest, client, caches, if_none_match)
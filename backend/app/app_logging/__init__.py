@@ -0,0 +1,11 @@
+__all__ = (
+    "JsonFormatter",
+    "RequestLogMiddleware",
+    "configure_logging",
+    "new_request_id",
+    "request_id_var",
+)
+
+from .context import new_request_id, request_id_var
+from .middleware import RequestLogMiddleware
+from .pipeline import JsonFormatter, configure_logging
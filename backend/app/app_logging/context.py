@@ -0,0 +1,19 @@
+import re
+import uuid
+from contextvars import ContextVar
+
+# id текущего запроса: попадает в каждую запись лога и в запросы к апстримам
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+REQUEST_ID_RE = re.compile(r"^[\w.-]{1,128}$")
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def accept_request_id(value: str | None) -> str:
+    """id от nginx или клиента, если он похож на id; иначе — новый."""
+    if value and REQUEST_ID_RE.match(value):
+        return value
+    return new_request_id()
@@ -0,0 +1,72 @@
+import logging
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import LoggingConfig
+
+from .context import accept_request_id, request_id_var
+
+access_log = logging.getLogger("app.access")
+
+
+class RequestLogMiddleware:
+    """
+    Присваивает запросу id (из заголовка nginx или новый), возвращает его
+    клиенту и пишет access-лог с выборкой по шаблону маршрута. Ошибки
+    и медленные запросы попадают в лог всегда.
+    """
+
+    def __init__(self, app: ASGIApp, config: LoggingConfig):
+        self.app = app
+        self.config = config
+        self.header = config.request_id_header.lower().encode("latin-1")
+
+    def sampled(self, route_path: str, status_code: int, duration: float) -> bool:
+        if status_code >= 400 or duration >= self.config.slow_request_threshold:
+            return True
+        rate = self.config.access_sample_rates.get(route_path, self.config.access_sample_rate)
+        return rate >= 1 or random.random() < rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = next((v for k, v in scope["headers"] if k == self.header), None)
+        request_id = accept_request_id(incoming.decode("latin-1") if incoming else None)
+        token = request_id_var.set(request_id)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (self.header, request_id.encode("latin-1"))],
+                }
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            route_path = getattr(scope.get("route"), "path", "unmatched")
+            if self.sampled(route_path, status_code, duration):
+                access_log.info(
+                    "%s %s %s",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": route_path,
+                        "status": status_code,
+                        "duration_ms": round(duration * 1000, 2),
+                    },
+                )
+            request_id_var.reset(token)
@@ -0,0 +1,110 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+from config import LoggingConfig
+
+from .context import request_id_var
+
+# Стандартные атрибуты LogRecord; всё остальное пришло через extra=
+RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "request_id",
+    # uvicorn дублирует сообщение с ANSI-цветами
+    "color_message",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись: время, уровень, логгер, сообщение, request_id и поля из extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return orjson.dumps(payload, default=str).decode()
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Кладёт запись в очередь, не форматируя её: вывод делает QueueListener
+    в отдельном потоке, и медленный stdout не задерживает цикл событий.
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Всё, что зависит от контекста или ссылается на живые объекты, фиксируем сейчас
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LoggingPipeline:
+    def __init__(self, config: LoggingConfig, stream=None):
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if config.json_logs else logging.Formatter(config.log_format))
+        self.output = output
+        self.handler = ContextQueueHandler(queue.SimpleQueue())
+        self.listener = self._start_listener()
+
+    def _start_listener(self) -> QueueListener:
+        listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        listener.start()
+        return listener
+
+    def after_fork(self) -> None:
+        # Поток слушателя после fork в воркер не переезжает — запускаем свой на новой очереди
+        self.handler.queue = queue.SimpleQueue()
+        self.listener = self._start_listener()
+
+    def stop(self) -> None:
+        self.listener.stop()
+
+
+_pipeline: LoggingPipeline | None = None
+
+
+def configure_logging(config: LoggingConfig) -> QueueHandler:
+    """
+    Направляет корневой логгер в очередь с выводом в отдельном потоке.
+    Повторный вызов возвращает тот же обработчик — его же использует gunicorn.
+    """
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LoggingPipeline(config)
+        os.register_at_fork(after_in_child=_pipeline.after_fork)
+        atexit.register(_pipeline.stop)
+        root = logging.getLogger()
+        root.handlers = [_pipeline.handler]
+        root.setLevel(config.log_level.upper())
+        # Строка на каждый запрос к апстриму — это уже есть в метриках
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    return _pipeline.handler
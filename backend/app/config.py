@@ -13,6 +13,10 @@ LOG_DEFAULT_FORMAT = "[%(asctime)s.%(msecs)03d] %(module)10s:%(lineno)-3d %(leve
 class RunConfig(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8000
+    reload: bool = True
+    # auto — uvloop и httptools, если установлены, иначе asyncio и h11
+    loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    http: Literal["auto", "h11", "httptools"] = "auto"
 
 
 class LoggingConfig(BaseModel):
@@ -24,13 +28,32 @@ class LoggingConfig(BaseModel):
         'critical',
     ] = 'info'
     log_format: str = LOG_DEFAULT_FORMAT
+    # json — одна строка JSON на запись; иначе текст по log_format
+    json_logs: bool = True
+    request_id_header: str = "X-Request-ID"
+    # Доля запросов в access-логе; ошибки (>= 400) и медленные запросы пишутся всегда
+    access_sample_rate: float = 1.0
+    access_sample_rates: dict[str, float] = {
+        "/api/v1/health": 0.01,
+        "/metrics": 0.0,
+    }
+    slow_request_threshold: float = 1.0
 
 
 class GunicornConfig(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8000
-    workers: int = 1
-    timeout: int = 900
+    # 0 — по числу доступных процессу CPU
+    workers: int = 0
+    # Воркер, не отвечающий мастеру дольше, перезапускается
+    timeout: int = 60
+    # Не меньше бюджета запроса к банку (http.bank.retry.deadline), чтобы дождаться начатых платежей
+    graceful_timeout: int = 45
+    keepalive: int = 5
+    preload_app: bool = True
+    # Плановый перезапуск воркера против роста памяти; jitter — чтобы воркеры не уходили разом
+    max_requests: int = 10000
+    max_requests_jitter: int = 1000
 
 
 class ApiV1Prefix(BaseModel):
@@ -44,9 +67,224 @@ class ApiPrefix(BaseModel):
     v1: ApiV1Prefix = ApiV1Prefix()
 
 
+class UpstreamUrlsConfig(BaseModel):
+    bank: str = "https://openbanking-api.bakai.kg"
+    qr: str = "https://qrpay.bakai.kg"
+    qr_test: str = "https://qrpay-test.bakai.kg"
+    gis: str = "https://public-api.reviews.2gis.com"
+
+
+class CircuitBreakerConfig(BaseModel):
+    window: int = 20
+    min_calls: int = 5
+    failure_rate: float = 0.5
+    open_timeout: float = 30
+    half_open_max_calls: int = 1
+
+
+class RetryConfig(BaseModel):
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2
+    deadline: float = 40
+
+
+class UpstreamClientConfig(BaseModel):
+    http2: bool = True
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30
+    timeout: float = 30
+    connect_timeout: float = 10
+    pool_timeout: float = 10
+    breaker: CircuitBreakerConfig = CircuitBreakerConfig()
+    retry: RetryConfig = RetryConfig()
+
+
+class HttpClientsConfig(BaseModel):
+    bank: UpstreamClientConfig = UpstreamClientConfig()
+    qr: UpstreamClientConfig = UpstreamClientConfig()
+    gis: UpstreamClientConfig = UpstreamClientConfig()
+
+
+class DeadlineConfig(BaseModel):
+    enabled: bool = True
+    # Бюджет запроса: чуть меньше proxy_read_timeout nginx (60 с), чтобы успеть ответить до 504
+    timeout: float = 55
+    # Клиент может сократить бюджет заголовком (в секундах), но не увеличить
+    header: str = "X-Request-Timeout"
+    # Отменять работу, включая запросы к банку, если клиент отключился
+    cancel_on_disconnect: bool = True
+
+
+class ReviewsCacheConfig(BaseModel):
+    enabled: bool = True
+    max_size: int = 5000
+    ttl: int = 3600
+    refresh_interval: int = 300
+    # Сводка по всем оценкам считается в том же проходе по страницам 2GIS,
+    # поэтому при включённой сводке кэш не фильтрует страницы по оценке
+    aggregates: bool = True
+    aggregates_top_n: int = 20
+
+
+class RedisConfig(BaseModel):
+    url: str = "redis://redis:6379/0"
+
+
+class IdempotencyConfig(BaseModel):
+    enabled: bool = True
+    backend: Literal["memory", "redis"] = "memory"
+    ttl: int = 86400
+    max_size: int = 10000
+    pending_ttl: int = 120
+    poll_interval: float = 0.2
+
+
+class QrCacheConfig(BaseModel):
+    enabled: bool = True
+    max_size: int = 10000
+    # Не отдаём из кэша QR, которому осталось жить меньше ttl_margin секунд
+    ttl_margin: int = 30
+
+
+class QrImageConfig(BaseModel):
+    sizes: list[int] = [128, 256, 512, 1024]
+    max_data_length: int = 1024
+    cache_max_bytes: int = 32 * 1024 * 1024
+    error_correction: Literal["l", "m", "q", "h"] = "m"
+    border: int = 4
+
+
+class BatchConfig(BaseModel):
+    max_items: int = 500
+    concurrency: int = 10
+    rate_per_second: float = 20
+    burst: int = 10
+
+
+class GisReviewsConfig(BaseModel):
+    # Организации, отзывы которых можно запрашивать; первая — по умолчанию
+    orgs: list[str] = ["70000001051350763"]
+    max_orgs_per_request: int = 10
+    page_size: int = 50
+    # Параметр запроса 2GIS для фильтра по оценке, если API его поддерживает;
+    # без него пятёрки отбираются на нашей стороне
+    rating_param: str | None = None
+    # Общий для всех организаций лимит параллельности и частоты запросов к 2GIS
+    throttle: BatchConfig = BatchConfig(concurrency=4, rate_per_second=10, burst=10)
+
+
+class MetricsConfig(BaseModel):
+    enabled: bool = True
+    multiproc_dir: str | None = "/tmp/prometheus_multiproc"
+
+
+class MqttConfig(BaseModel):
+    enabled: bool = False
+    host: str = "mosquitto"
+    port: int = 1883
+    username: str | None = None
+    password: SecretStr | None = None
+    topic_prefix: str = "payments"
+    queue_size: int = 1000
+    enqueue_timeout: float = 1
+    max_inflight: int = 10
+    reconnect_delay: float = 1
+    max_reconnect_delay: float = 30
+
+
+class MerchantCredentials(BaseModel):
+    username: str
+    password: SecretStr
+
+
+class BankAuthConfig(BaseModel):
+    token_path: str = "/api/Auth/Token"
+    # Если банк не вернул expires_in
+    default_ttl: int = 3600
+    # Токен не отдаём, если до истечения осталось меньше
+    expiry_margin: int = 60
+    # Фоновое обновление — заранее, за столько секунд до истечения
+    refresh_ahead: int = 300
+    refresh_interval: int = 30
+    merchants: dict[str, MerchantCredentials] = {}
+
+
+class OutboxConfig(BaseModel):
+    enabled: bool = False
+    path: str = "/data/outbox.sqlite3"
+    concurrency: int = 4
+    poll_interval: float = 1
+    # Сколько секунд задача числится за воркером, прежде чем её заберёт другой
+    lease: int = 120
+    max_attempts: int = 20
+    retry_base_delay: float = 5
+    retry_max_delay: float = 300
+    # Завершённые задачи хранятся столько секунд, потом удаляются при компактировании
+    retention: int = 86400
+    compact_interval: int = 3600
+
+
+class PaymentStatusConfig(BaseModel):
+    # Обязателен: без него все уведомления банка отклоняются
+    callback_secret: SecretStr | None = None
+    # Подпись — HMAC-SHA256 от «<timestamp>.<merchant_id>.<тело>» (services.sign_callback)
+    signature_header: str = "X-Signature"
+    timestamp_header: str = "X-Signature-Timestamp"
+    # Насколько время в timestamp_header может расходиться с нашим, секунд
+    signature_tolerance: int = 300
+    dedupe_ttl: int = 86400
+
+
+class RateLimitRule(BaseModel):
+    path: str
+    rate: float
+    burst: int
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = True
+    backend: Literal["memory", "redis"] = "memory"
+    max_keys: int = 100000
+    trust_forwarded_for: bool = True
+    # Первое совпадение по префиксу: пакетные маршруты — раньше одиночных.
+    # Пакет стоит по токену на элемент, burst — наибольший допустимый пакет
+    rules: list[RateLimitRule] = [
+        RateLimitRule(path="/api/v1/payments/make-payment-link/batch/", rate=20, burst=500),
+        RateLimitRule(path="/api/v1/payments/make-payment-link/", rate=5, burst=20),
+        RateLimitRule(path="/api/v1/qr-payments/generate-qr/batch/", rate=40, burst=500),
+        RateLimitRule(path="/api/v1/qr-payments/generate-qr/", rate=10, burst=40),
+    ]
+
+
+class CacheRule(BaseModel):
+    path: str
+    cache_control: str
+
+
+class HttpCacheConfig(BaseModel):
+    enabled: bool = True
+    # Тела меньше порога не сжимаем: заголовки gzip съедят выигрыш
+    gzip_min_size: int = 1024
+    gzip_level: int = 6
+    # GET/HEAD с ответом 200/304 по первому совпавшему префиксу пути;
+    # всё остальное, включая POST платёжных маршрутов и ошибки, — `default`
+    rules: list[CacheRule] = [
+        CacheRule(
+            path="/api/v1/2gis/",
+            cache_control="public, max-age=30, stale-while-revalidate=300, stale-if-error=3600",
+        ),
+        CacheRule(path="/api/openapi.json", cache_control="public, max-age=300"),
+    ]
+    default: str = "no-store"
+
+
 class DocsConfig(BaseModel):
     USERNAME: str = 'admin'
     PASSWORD: str = 'admin'
+    # Скачивать Swagger UI и ReDoc в static/docs при старте; без них страницы берут ассеты с CDN
+    vendor_assets: bool = True
 
 
 class Settings(BaseSettings):
@@ -62,6 +300,23 @@ class Settings(BaseSettings):
     logging: LoggingConfig = LoggingConfig()
     api: ApiPrefix = ApiPrefix()
     docs: DocsConfig = DocsConfig()
+    upstreams: UpstreamUrlsConfig = UpstreamUrlsConfig()
+    http: HttpClientsConfig = HttpClientsConfig()
+    deadline: DeadlineConfig = DeadlineConfig()
+    gis_reviews: GisReviewsConfig = GisReviewsConfig()
+    reviews_cache: ReviewsCacheConfig = ReviewsCacheConfig()
+    redis: RedisConfig = RedisConfig()
+    idempotency: IdempotencyConfig = IdempotencyConfig()
+    batch: BatchConfig = BatchConfig()
+    qr_cache: QrCacheConfig = QrCacheConfig()
+    qr_image: QrImageConfig = QrImageConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    mqtt: MqttConfig = MqttConfig()
+    payment_status: PaymentStatusConfig = PaymentStatusConfig()
+    bank_auth: BankAuthConfig = BankAuthConfig()
+    outbox: OutboxConfig = OutboxConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    http_cache: HttpCacheConfig = HttpCacheConfig()
     API_KEY_2GIS: str
 
 
@@ -1,30 +1,130 @@
-from contextlib import asynccontextmanager
+import asyncio
+import math
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.openapi.docs import (
     get_redoc_html,
     get_swagger_ui_html,
     get_swagger_ui_oauth2_redirect_html,
 )
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from api.api_v1.payment import build_payment_outbox_worker
+from config import settings
+from http_cache import negotiated_response
+from http_clients import CircuitOpenError, HttpClients
+from rate_limit import build_rate_limit_backend
+from static_build import PrecomputedSchema, asset_url
+from services import (
+    BankTokenProvider,
+    ByteLRUCache,
+    IdempotencyStore,
+    MqttPublisher,
+    Outbox,
+    ReviewsCache,
+    SingleFlightCache,
+    build_idempotency_backend,
+)
 from utils.dependencies_for_docs import get_current_user_for_docs
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    pass
+    app.state.http_clients = HttpClients(settings.http)
+    background_tasks = []
+    if settings.reviews_cache.enabled:
+        app.state.reviews_caches = {
+            org_id: ReviewsCache(
+                client=app.state.http_clients.gis,
+                org_id=org_id,
+                config=settings.reviews_cache,
+            )
+            for org_id in settings.gis_reviews.orgs
+        }
+        background_tasks.extend(
+            asyncio.create_task(cache.run()) for cache in app.state.reviews_caches.values()
+        )
+    if settings.bank_auth.merchants:
+        app.state.bank_tokens = BankTokenProvider(
+            client=app.state.http_clients.bank,
+            config=settings.bank_auth,
+        )
+        background_tasks.append(asyncio.create_task(app.state.bank_tokens.run()))
+    if settings.idempotency.enabled:
+        app.state.idempotency = IdempotencyStore(
+            backend=build_idempotency_backend(settings.idempotency, settings.redis.url),
+            config=settings.idempotency,
+        )
+    if settings.qr_cache.enabled:
+        app.state.qr_cache = SingleFlightCache(max_size=settings.qr_cache.max_size)
+    app.state.qr_image_cache = ByteLRUCache(max_bytes=settings.qr_image.cache_max_bytes)
+    app.state.status_dedupe = build_idempotency_backend(settings.idempotency, settings.redis.url)
+    if settings.rate_limit.enabled:
+        app.state.rate_limit_backend = build_rate_limit_backend(settings.rate_limit, settings.redis.url)
+    if settings.mqtt.enabled:
+        app.state.mqtt_publisher = MqttPublisher(settings.mqtt)
+        background_tasks.append(asyncio.create_task(app.state.mqtt_publisher.run()))
+    if settings.outbox.enabled:
+        app.state.outbox = Outbox(settings.outbox)
+        worker = build_payment_outbox_worker(app.state.outbox, app.state)
+        background_tasks.append(asyncio.create_task(worker.run()))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        if settings.idempotency.enabled:
+            await app.state.idempotency.backend.aclose()
+        await app.state.status_dedupe.aclose()
+        if settings.rate_limit.enabled:
+            await app.state.rate_limit_backend.aclose()
+        if settings.outbox.enabled:
+            app.state.outbox.close()
+        await app.state.http_clients.aclose()
+
+
+def register_exception_handlers(app: FastAPI):
+    @app.exception_handler(CircuitOpenError)
+    async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Банк временно недоступен. Попробуйте позже."},
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+
+
+OPENAPI_URL = "/api/openapi.json"
+
+
+def register_openapi_route(app: FastAPI):
+    """
+    Схема собирается один раз (static_build.py) и отдаётся готовыми байтами,
+    сжатыми заранее, с ETag.
+    """
+    schema: PrecomputedSchema | None = None
+
+    @app.get(OPENAPI_URL, include_in_schema=False)
+    async def openapi_json(request: Request):
+        nonlocal schema
+        if schema is None:
+            schema = PrecomputedSchema.load(app)
+        # Cache-Control — из settings.http_cache (CacheControlMiddleware)
+        return negotiated_response(request, schema.body, schema.gzipped, {"ETag": schema.etag})
 
 
 def register_static_docs_routes(app: FastAPI):
     @app.get("/api/docs", include_in_schema=False, dependencies=[Depends(get_current_user_for_docs)])
     async def custom_swagger_ui_html():
         return get_swagger_ui_html(
-            openapi_url=app.openapi_url,
+            openapi_url=OPENAPI_URL,
             title=app.title + " - Swagger UI",
             oauth2_redirect_url=app.swagger_ui_oauth2_redirect_url,
-            swagger_js_url="https://unpkg.com/swagger-ui-dist@5/swagger-ui-bundle.js",
-            swagger_css_url="https://unpkg.com/swagger-ui-dist@5/swagger-ui.css",
+            swagger_js_url=asset_url("swagger-ui-bundle.js"),
+            swagger_css_url=asset_url("swagger-ui.css"),
         )
 
     @app.get(app.swagger_ui_oauth2_redirect_url, include_in_schema=False)
@@ -34,9 +134,9 @@ def register_static_docs_routes(app: FastAPI):
     @app.get("/api/redoc", include_in_schema=False)
     async def redoc_html():
         return get_redoc_html(
-            openapi_url=app.openapi_url,
+            openapi_url=OPENAPI_URL,
             title=app.title + " - ReDoc",
-            redoc_js_url="https://unpkg.com/redoc@next/bundles/redoc.standalone.js",
+            redoc_js_url=asset_url("redoc.standalone.js"),
         )
 
 
@@ -46,9 +146,14 @@ def create_app(
     app = FastAPI(
         docs_url=None if create_custom_static_urls else "/docs",
         redoc_url=None if create_custom_static_urls else "/redoc",
-        openapi_url='/api/openapi.json'
+        # В режиме своих страниц документации схему отдаёт register_openapi_route
+        openapi_url=None if create_custom_static_urls else OPENAPI_URL,
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
     )
     app.mount("/static", StaticFiles(directory="static"), name="static")
+    register_exception_handlers(app)
     if create_custom_static_urls:
+        register_openapi_route(app)
         register_static_docs_routes(app)
     return app
@@ -0,0 +1,9 @@
+__all__ = (
+    "DeadlineMiddleware",
+    "current_deadline",
+    "deadline_var",
+    "earliest",
+)
+
+from .context import current_deadline, deadline_var, earliest
+from .middleware import DeadlineMiddleware
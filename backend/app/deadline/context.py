@@ -0,0 +1,26 @@
+import time
+from contextvars import ContextVar
+
+# Момент (time.monotonic()), после которого ответ клиенту уже не нужен
+deadline_var: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> float | None:
+    return deadline_var.get()
+
+
+def earliest(*deadlines: float | None) -> float | None:
+    return min((d for d in deadlines if d is not None), default=None)
+
+
+def parse_timeout(value: str | None, limit: float) -> float:
+    """Бюджет из заголовка в секундах; некорректный или больший лимита — лимит."""
+    try:
+        timeout = float(value) if value else limit
+    except ValueError:
+        return limit
+    return min(timeout, limit) if timeout > 0 else limit
+
+
+def deadline_after(timeout: float) -> float:
+    return time.monotonic() + timeout
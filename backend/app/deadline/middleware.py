@@ -0,0 +1,96 @@
+import asyncio
+import logging
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import DeadlineConfig
+
+from .context import deadline_after, deadline_var, parse_timeout
+
+log = logging.getLogger(__name__)
+
+# Код nginx для запроса, клиент которого закрыл соединение до ответа
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DeadlineMiddleware:
+    """
+    Задаёт запросу дедлайн (settings.deadline.timeout или меньше из заголовка),
+    который send_with_retry учитывает в таймаутах и повторах.
+
+    Если клиент отключился раньше, чем получил ответ, обработчик отменяется
+    вместе с запросами к апстримам, а наружу (метрикам и access-логу)
+    уходит статус 499.
+    """
+
+    def __init__(self, app: ASGIApp, config: DeadlineConfig):
+        self.app = app
+        self.config = config
+        self.header = config.header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = next((v for k, v in scope["headers"] if k == self.header), None)
+        timeout = parse_timeout(value.decode("latin-1") if value else None, self.config.timeout)
+        token = deadline_var.set(deadline_after(timeout))
+        try:
+            if self.config.cancel_on_disconnect:
+                await self.call_cancellable(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            deadline_var.reset(token)
+
+    async def call_cancellable(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # receive читает только фоновая задача: так отключение клиента видно,
+        # даже когда обработчик уже прочитал тело и ждёт банк
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        response_started = False
+        response_complete = False
+
+        async def read_messages() -> None:
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def queued_receive() -> Message:
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                # Повторные вызовы тоже должны видеть отключение
+                messages.put_nowait(message)
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        app_task = asyncio.ensure_future(self.app(scope, queued_receive, send_wrapper))
+        reader = asyncio.ensure_future(read_messages())
+        try:
+            await asyncio.wait({app_task, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not app_task.done() and not response_complete:
+                # Клиент ушёл, ответ ему уже не нужен
+                app_task.cancel()
+                try:
+                    await app_task
+                except asyncio.CancelledError:
+                    pass
+                log.info("Client disconnected, request cancelled", extra={"path": scope["path"]})
+                if not response_started:
+                    await send({"type": "http.response.start", "status": CLIENT_CLOSED_REQUEST, "headers": []})
+                    await send({"type": "http.response.body", "body": b""})
+                return
+            await app_task
+        finally:
+            reader.cancel()
+            if not app_task.done():
+                app_task.cancel()
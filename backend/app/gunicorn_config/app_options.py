@@ -1,4 +1,27 @@
+import os
+
+from http_clients import reset_after_fork
+from metrics import mark_worker_dead
+
 from .logger import GunicornLogger
+from .worker import AppUvicornWorker
+
+
+def default_workers() -> int:
+    # В контейнере учитываем ограничение по cpuset, а не все ядра хоста
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def post_fork(server, worker) -> None:
+    # С preload_app приложение импортировано в мастере: состояние на процесс создаём заново
+    reset_after_fork()
+
+
+def child_exit(server, worker) -> None:
+    mark_worker_dead(worker.pid)
 
 
 def get_app_options(
@@ -7,14 +30,26 @@ def get_app_options(
     timeout: int,
     workers: int,
     log_level: str,
+    graceful_timeout: int | None = None,
+    keepalive: int | None = None,
+    preload_app: bool = False,
+    max_requests: int = 0,
+    max_requests_jitter: int = 0,
 ) -> dict:
     return {
-        "accesslog": "-",
+        "accesslog": None,
         "errorlog": "-",
         "bind": f"{host}:{port}",
         "loglevel": log_level,
         "logger_class": GunicornLogger,
         "timeout": timeout,
-        "workers": workers,
-        "worker_class": "uvicorn.workers.UvicornWorker",
+        "graceful_timeout": graceful_timeout,
+        "keepalive": keepalive,
+        "workers": workers or default_workers(),
+        "worker_class": AppUvicornWorker,
+        "preload_app": preload_app,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests_jitter,
+        "post_fork": post_fork,
+        "child_exit": child_exit,
     }
@@ -2,6 +2,7 @@ from logging import Formatter
 
 from gunicorn.glogging import Logger
 
+from app_logging import configure_logging
 from config import settings
 
 
@@ -9,6 +10,13 @@ class GunicornLogger(Logger):
     def setup(self, cfg) -> None:
         super().setup(cfg)
 
+        if settings.logging.json_logs:
+            # Логи мастера и воркеров — через ту же очередь и в том же JSON, что и логи приложения
+            handler = configure_logging(settings.logging)
+            self.error_log.handlers = [handler]
+            self.access_log.handlers = [handler]
+            return
+
         self._set_handler(
             log=self.access_log,
             output=cfg.accesslog,
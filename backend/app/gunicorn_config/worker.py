@@ -0,0 +1,14 @@
+from uvicorn.workers import UvicornWorker
+
+from config import settings
+
+
+class AppUvicornWorker(UvicornWorker):
+    """UvicornWorker с циклом событий и HTTP-парсером из settings.run."""
+
+    CONFIG_KWARGS = {
+        "loop": settings.run.loop,
+        "http": settings.run.http,
+        # access-лог пишет RequestLogMiddleware, с request_id и выборкой
+        "access_log": False,
+    }
@@ -0,0 +1,19 @@
+__all__ = (
+    "CacheControlMiddleware",
+    "CompressionMiddleware",
+    "accepts_gzip",
+    "etag_matches",
+    "gzip_body",
+    "gzip_etag",
+    "negotiated_response",
+)
+
+from .cache_control import CacheControlMiddleware
+from .compression import (
+    CompressionMiddleware,
+    accepts_gzip,
+    etag_matches,
+    gzip_body,
+    gzip_etag,
+    negotiated_response,
+)
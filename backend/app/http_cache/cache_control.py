@@ -0,0 +1,46 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import HttpCacheConfig
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+CACHEABLE_STATUSES = (200, 304)
+
+
+class CacheControlMiddleware:
+    """
+    Явный Cache-Control для ответов, где обработчик его не выставил.
+
+    Успешные GET/HEAD получают политику первого правила с совпавшим
+    префиксом пути; остальные ответы — `default` (no-store), чтобы ни nginx,
+    ни браузер не сохранили платёжные POST и ошибки.
+    """
+
+    def __init__(self, app: ASGIApp, config: HttpCacheConfig):
+        self.app = app
+        self.config = config
+
+    def match(self, path: str) -> str | None:
+        for rule in self.config.rules:
+            if path.startswith(rule.path):
+                return rule.cache_control
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.match(scope["path"]) if scope["method"] in CACHEABLE_METHODS else None
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    if policy is not None and message["status"] in CACHEABLE_STATUSES:
+                        headers["Cache-Control"] = policy
+                    else:
+                        headers["Cache-Control"] = self.config.default
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,144 @@
+import gzip
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import HttpCacheConfig
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip().removeprefix("q=")
+        try:
+            return not q or float(q) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def gzip_body(data: bytes, level: int) -> bytes:
+    # mtime=0 — одинаковые байты для одинакового тела, ETag и кэш nginx не расходятся
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def gzip_etag(etag: str) -> str:
+    # Сжатые байты — другое представление, у него свой сильный ETag
+    if etag.endswith('"'):
+        return etag[:-1] + '-gzip"'
+    return etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match совпадает с ETag ресурса или его сжатого варианта (слабое сравнение)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    variants = {etag, gzip_etag(etag)}
+    return any(tag.strip().removeprefix("W/") in variants for tag in if_none_match.split(","))
+
+
+def negotiated_response(
+    request: Request,
+    body: bytes,
+    gzipped: bytes,
+    headers: dict[str, str],
+    media_type: str = "application/json",
+) -> Response:
+    """
+    Ответ заранее сжатым телом, если клиент принимает gzip.
+    На совпавший If-None-Match — 304 с ETag выбранного варианта.
+    """
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    gzip_accepted = accepts_gzip(request.headers.get("accept-encoding"))
+    etag = headers.get("ETag")
+    if etag is not None:
+        if gzip_accepted:
+            headers["ETag"] = gzip_etag(etag)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    if gzip_accepted:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=gzipped, media_type=media_type, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    gzip для текстовых ответов не меньше `gzip_min_size` байт.
+
+    Ответы с уже выставленным Content-Encoding (заранее сжатые снимки и схема)
+    проходят как есть. Потоковые ответы (NDJSON) не сжимаются,
+    чтобы строки уходили клиенту сразу, а не копились в буфере gzip.
+    """
+
+    def __init__(self, app: ASGIApp, config: HttpCacheConfig):
+        self.app = app
+        self.config = config
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gzip_accepted = accepts_gzip(Headers(scope=scope).get("accept-encoding"))
+        start: Message | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                    passthrough = True
+                    await send(message)
+                    return
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                if not gzip_accepted:
+                    passthrough = True
+                    await send(message)
+                    return
+                # Решение о сжатии — по первому куску тела
+                start = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            pending, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.config.gzip_min_size:
+                passthrough = True
+                await send(pending)
+                await send(message)
+                return
+
+            compressed = gzip_body(body, self.config.gzip_level)
+            headers = MutableHeaders(scope=pending)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(compressed))
+            if "etag" in headers:
+                headers["ETag"] = gzip_etag(headers["etag"])
+            await send(pending)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
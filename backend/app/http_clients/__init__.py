@@ -0,0 +1,23 @@
+__all__ = (
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "HttpClients",
+    "breakers",
+    "build_client",
+    "reset_after_fork",
+    "send_with_retry",
+    "get_http_clients",
+    "get_bank_client",
+    "get_qr_client",
+    "get_gis_client",
+)
+
+from .breaker import CircuitBreaker, CircuitOpenError, breakers
+from .pool import HttpClients, build_client, reset_after_fork
+from .retry import send_with_retry
+from .dependencies import (
+    get_http_clients,
+    get_bank_client,
+    get_qr_client,
+    get_gis_client,
+)
@@ -0,0 +1,116 @@
+import time
+from collections import deque
+from typing import Literal
+
+from config import CircuitBreakerConfig
+
+State = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"circuit for {host} is open, retry after {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для одного апстрим-хоста.
+
+    closed: считаем долю ошибок в окне последних `window` вызовов;
+    open: сразу отказываем, пока не пройдёт `open_timeout`;
+    half_open: пропускаем `half_open_max_calls` пробных вызовов —
+    успех закрывает предохранитель, ошибка снова открывает.
+    """
+
+    def __init__(self, host: str, config: CircuitBreakerConfig):
+        self.host = host
+        self.config = config
+        self.state: State = "closed"
+        self._outcomes: deque[bool] = deque(maxlen=config.window)
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @property
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self._opened_at + self.config.open_timeout - time.monotonic())
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if self.retry_after > 0:
+                raise CircuitOpenError(self.host, self.retry_after)
+            self.state = "half_open"
+            self._half_open_calls = 0
+        if self.state == "half_open":
+            if self._half_open_calls >= self.config.half_open_max_calls:
+                raise CircuitOpenError(self.host, self.config.open_timeout)
+            self._half_open_calls += 1
+
+    def release(self) -> None:
+        """Вызов отменён, не дождавшись ответа, — освобождаем пробный слот."""
+        if self.state == "half_open" and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        if self.state == "half_open":
+            self.state = "closed"
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == "half_open":
+            self._open()
+            return
+        self._outcomes.append(False)
+        if (
+            len(self._outcomes) >= self.config.min_calls
+            and self.failure_rate >= self.config.failure_rate
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def as_dict(self) -> dict:
+        return {
+            "host": self.host,
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 3),
+            "calls_in_window": len(self._outcomes),
+            "retry_after": round(self.retry_after, 1),
+        }
+
+
+class CircuitBreakerRegistry:
+    """
+    Предохранители, общие для всех запросов воркера, — по одному на хост.
+    """
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str, config: CircuitBreakerConfig) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(host, config)
+        return breaker
+
+    def clear(self) -> None:
+        self._breakers.clear()
+
+    def as_list(self) -> list[dict]:
+        return [breaker.as_dict() for breaker in self._breakers.values()]
+
+
+breakers = CircuitBreakerRegistry()
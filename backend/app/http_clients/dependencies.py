@@ -0,0 +1,20 @@
+import httpx
+from fastapi import Depends, Request
+
+from .pool import HttpClients
+
+
+def get_http_clients(request: Request) -> HttpClients:
+    return request.app.state.http_clients
+
+
+def get_bank_client(clients: HttpClients = Depends(get_http_clients)) -> httpx.AsyncClient:
+    return clients.bank
+
+
+def get_qr_client(clients: HttpClients = Depends(get_http_clients)) -> httpx.AsyncClient:
+    return clients.qr
+
+
+def get_gis_client(clients: HttpClients = Depends(get_http_clients)) -> httpx.AsyncClient:
+    return clients.gis
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+
+from app_logging import request_id_var
+from config import HttpClientsConfig, UpstreamClientConfig, settings
+from metrics import InstrumentedTransport
+
+from .breaker import breakers
+from .throttle import host_limiters
+
+
+async def propagate_request_id(request: httpx.Request) -> None:
+    request_id = request_id_var.get()
+    if request_id and settings.logging.request_id_header not in request.headers:
+        request.headers[settings.logging.request_id_header] = request_id
+
+
+def build_client(name: str, config: UpstreamClientConfig) -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        http2=config.http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+    )
+    if settings.metrics.enabled:
+        transport = InstrumentedTransport(name, transport)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(
+            config.timeout,
+            connect=config.connect_timeout,
+            pool=config.pool_timeout,
+        ),
+        event_hooks={"request": [propagate_request_id]},
+    )
+
+
+class HttpClients:
+    """
+    Долгоживущие httpx-клиенты, по одному на апстрим.
+    Соединения (TCP + TLS) переиспользуются между запросами.
+    """
+
+    def __init__(self, config: HttpClientsConfig):
+        self.bank = build_client("bank", config.bank)
+        self.qr = build_client("qr", config.qr)
+        self.gis = build_client("gis", config.gis)
+
+    async def aclose(self) -> None:
+        await asyncio.gather(
+            self.bank.aclose(),
+            self.qr.aclose(),
+            self.gis.aclose(),
+        )
+
+
+def reset_after_fork() -> None:
+    """
+    Сбрасывает состояние уровня модуля, унаследованное от мастера gunicorn.
+
+    Сами пулы соединений (HttpClients) создаются в lifespan уже в воркере,
+    поэтому сокеты мастера в воркеры не попадают; здесь — предохранители
+    и лимитеры, которые иначе начнут жизнь воркера с чужой статистикой.
+    """
+    breakers.clear()
+    host_limiters.clear()
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import time
+
+import httpx
+
+from config import RetryConfig, UpstreamClientConfig
+from deadline import current_deadline, earliest
+from metrics import UPSTREAM_ABANDONED, UPSTREAM_RETRIES
+
+from .breaker import breakers
+
+# До банка запрос гарантированно не дошёл — повтор безопасен
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def backoff_delay(attempt: int, config: RetryConfig) -> float:
+    """Экспоненциальная задержка с полным джиттером."""
+    return random.uniform(0, min(config.max_delay, config.base_delay * 2 ** attempt))
+
+
+def clamp_timeout(timeout: httpx.Timeout, remaining: float) -> httpx.Timeout:
+    def clamp(value: float | None) -> float:
+        return remaining if value is None else min(value, remaining)
+
+    return httpx.Timeout(
+        connect=clamp(timeout.connect),
+        read=clamp(timeout.read),
+        write=clamp(timeout.write),
+        pool=clamp(timeout.pool),
+    )
+
+
+async def send_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    upstream: UpstreamClientConfig,
+    deadline: float | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Отправляет запрос через предохранитель хоста и повторяет только
+    ошибки соединения — с экспоненциальной задержкой, но не дольше общего
+    дедлайна (time.monotonic()): самого раннего из переданного, дедлайна
+    входящего запроса и `upstream.retry.deadline`.
+
+    Бросает CircuitOpenError, если предохранитель хоста открыт.
+    """
+    retry = upstream.retry
+    breaker = breakers.get(httpx.URL(url).host, upstream.breaker)
+    deadline = earliest(deadline, current_deadline(), time.monotonic() + retry.deadline)
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            UPSTREAM_ABANDONED.labels(breaker.host, "deadline").inc()
+            raise httpx.TimeoutException(f"upstream deadline exceeded for {url}")
+        breaker.before_call()
+        try:
+            # Таймауты httpx — на каждую операцию; общий дедлайн ограничиваем сверху отдельно
+            async with asyncio.timeout(remaining):
+                response = await client.request(
+                    method,
+                    url,
+                    timeout=clamp_timeout(client.timeout, remaining),
+                    **kwargs,
+                )
+        except RETRYABLE_ERRORS:
+            breaker.record_failure()
+            attempt += 1
+            delay = backoff_delay(attempt, retry)
+            if attempt >= retry.max_attempts or time.monotonic() + delay >= deadline:
+                raise
+            UPSTREAM_RETRIES.labels(breaker.host).inc()
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                UPSTREAM_ABANDONED.labels(breaker.host, "cancelled").inc()
+                raise
+            continue
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            if isinstance(e, httpx.TimeoutException) and time.monotonic() >= deadline:
+                UPSTREAM_ABANDONED.labels(breaker.host, "deadline").inc()
+            raise
+        except TimeoutError:
+            # Истёк бюджет запроса, а не отказал апстрим — предохранитель не трогаем
+            breaker.release()
+            UPSTREAM_ABANDONED.labels(breaker.host, "deadline").inc()
+            raise httpx.TimeoutException(f"upstream deadline exceeded for {url}")
+        except asyncio.CancelledError:
+            # Клиент отключился — ответ апстрима уже никому не нужен
+            breaker.release()
+            UPSTREAM_ABANDONED.labels(breaker.host, "cancelled").inc()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from config import BatchConfig
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket: `rate` запросов в секунду, всплеск до `burst`.
+    Ожидающие обслуживаются по очереди.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostLimiter:
+    """Ограничение параллельности и частоты запросов к одному хосту."""
+
+    def __init__(self, config: BatchConfig):
+        self.semaphore = asyncio.Semaphore(config.concurrency)
+        self.rate_limiter = AsyncRateLimiter(config.rate_per_second, config.burst)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self.semaphore:
+            await self.rate_limiter.acquire()
+            yield
+
+
+class HostLimiterRegistry:
+    def __init__(self):
+        self._limiters: dict[str, HostLimiter] = {}
+
+    def get(self, host: str, config: BatchConfig) -> HostLimiter:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = HostLimiter(config)
+        return limiter
+
+    def clear(self) -> None:
+        self._limiters.clear()
+
+
+host_limiters = HostLimiterRegistry()
@@ -1,16 +1,19 @@
-import logging
 import uvicorn
 
 from fastapi.middleware.cors import CORSMiddleware
 
+from app_logging import RequestLogMiddleware, configure_logging
 from config import settings
 from api import router as api_router
 from create_app import create_app
+from deadline import DeadlineMiddleware
+from http_cache import CacheControlMiddleware, CompressionMiddleware
+from metrics import MetricsMiddleware, prepare_multiproc_dir, router as metrics_router
+from rate_limit import RateLimitMiddleware
+from static_build import build_static
 
 
-logging.basicConfig(
-    format=settings.logging.log_format,
-)
+configure_logging(settings.logging)
 
 main_app = create_app(
     create_custom_static_urls=True,
@@ -19,19 +22,43 @@ main_app = create_app(
 main_app.include_router(
     api_router,
 )
+if settings.deadline.enabled:
+    main_app.add_middleware(DeadlineMiddleware, config=settings.deadline)
+if settings.rate_limit.enabled:
+    main_app.add_middleware(
+        RateLimitMiddleware,
+        config=settings.rate_limit,
+        merchants=settings.bank_auth.merchants.keys(),
+    )
+if settings.metrics.enabled:
+    main_app.include_router(metrics_router)
+    main_app.add_middleware(MetricsMiddleware)
+if settings.http_cache.enabled:
+    main_app.add_middleware(CacheControlMiddleware, config=settings.http_cache)
+    main_app.add_middleware(CompressionMiddleware, config=settings.http_cache)
 main_app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[settings.logging.request_id_header],
 )
+# Снаружи всех: id запроса нужен и в ответах 429 от лимитера, и в access-логе
+main_app.add_middleware(RequestLogMiddleware, config=settings.logging)
 
 if __name__ == "__main__":
+    prepare_multiproc_dir()
+    build_static(main_app, vendor_assets=settings.docs.vendor_assets)
     uvicorn.run(
         "main:main_app",
         host=settings.run.host,
         port=settings.run.port,
-        reload=True,
+        reload=settings.run.reload,
+        loop=settings.run.loop,
+        http=settings.run.http,
+        # access-лог пишет RequestLogMiddleware
+        access_log=False,
+        log_config=None,
     )
 
@@ -0,0 +1,14 @@
+__all__ = (
+    "InstrumentedTransport",
+    "MetricsMiddleware",
+    "UPSTREAM_ABANDONED",
+    "UPSTREAM_RETRIES",
+    "mark_worker_dead",
+    "prepare_multiproc_dir",
+    "router",
+)
+
+from .registry import UPSTREAM_ABANDONED, UPSTREAM_RETRIES, mark_worker_dead, prepare_multiproc_dir
+from .middleware import MetricsMiddleware
+from .transport import InstrumentedTransport
+from .router import router
@@ -0,0 +1,84 @@
+import os
+import shutil
+
+from config import settings
+
+# Каталог для multiprocess-режима нужно задать до импорта prometheus_client
+if settings.metrics.multiproc_dir:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.metrics.multiproc_dir)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Запросы к API",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса к API",
+    ("method", "route"),
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Запросы к внешним API; status — HTTP-код или timeout/error",
+    ("upstream", "host", "status"),
+)
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Время запроса к внешнему API до получения заголовков ответа",
+    ("upstream", "host"),
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_STAGE_DURATION = Histogram(
+    "upstream_stage_duration_seconds",
+    "Время этапов запроса: connect (DNS + TCP), tls, send, wait (до заголовков ответа), body",
+    ("upstream", "host", "stage"),
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total",
+    "Повторы запросов к внешним API",
+    ("host",),
+)
+UPSTREAM_ABANDONED = Counter(
+    "upstream_abandoned_total",
+    "Запросы к внешним API, брошенные до ответа; reason — cancelled (клиент отключился) или deadline",
+    ("host", "reason"),
+)
+
+
+def prepare_multiproc_dir() -> None:
+    """
+    Очищает каталог метрик перед стартом воркеров — вызывается в мастере gunicorn.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def mark_worker_dead(pid: int) -> None:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def render_latest() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Суммируем значения всех воркеров
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
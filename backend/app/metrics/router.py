@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from .registry import render_latest
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,68 @@
+import time
+
+import httpx
+
+from .registry import UPSTREAM_DURATION, UPSTREAM_REQUESTS, UPSTREAM_STAGE_DURATION
+
+STAGES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "wait",
+    "receive_response_body": "body",
+}
+
+
+class StageTrace:
+    """Колбэк для `request.extensions["trace"]` httpcore."""
+
+    def __init__(self, upstream: str, host: str):
+        self.upstream = upstream
+        self.host = host
+        self._started: dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        # Имена событий: "connection.connect_tcp.started", "http11.receive_response_headers.complete", ...
+        _, _, event = event_name.partition(".")
+        step, _, phase = event.rpartition(".")
+        stage = STAGES.get(step)
+        if stage is None:
+            return
+        if phase == "started":
+            self._started[step] = time.perf_counter()
+        elif step in self._started:
+            UPSTREAM_STAGE_DURATION.labels(self.upstream, self.host, stage).observe(
+                time.perf_counter() - self._started.pop(step)
+            )
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Обёртка над транспортом httpx: длительность, статусы, таймауты
+    и время этапов соединения для каждого запроса к апстриму.
+    """
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        request.extensions["trace"] = StageTrace(self.upstream, host)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            UPSTREAM_REQUESTS.labels(self.upstream, host, "timeout").inc()
+            raise
+        except httpx.TransportError:
+            UPSTREAM_REQUESTS.labels(self.upstream, host, "error").inc()
+            raise
+        finally:
+            UPSTREAM_DURATION.labels(self.upstream, host).observe(time.perf_counter() - started)
+        UPSTREAM_REQUESTS.labels(self.upstream, host, str(response.status_code)).inc()
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
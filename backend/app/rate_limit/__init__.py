@@ -0,0 +1,9 @@
+__all__ = (
+    "RateLimitBackend",
+    "RateLimitMiddleware",
+    "RateLimitResult",
+    "build_rate_limit_backend",
+)
+
+from .engine import RateLimitBackend, RateLimitResult, build_rate_limit_backend
+from .middleware import RateLimitMiddleware
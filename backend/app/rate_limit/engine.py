@@ -0,0 +1,123 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from config import RateLimitConfig
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Через сколько секунд появится следующий токен (для Retry-After)
+    retry_after: float
+    # Через сколько секунд ведро снова будет полным (для RateLimit-Reset)
+    reset_after: float
+
+
+def take_tokens(
+    tokens: float,
+    updated: float,
+    now: float,
+    rate: float,
+    burst: int,
+    cost: int,
+) -> tuple[float, RateLimitResult]:
+    """
+    Один шаг token bucket за O(1): пополнить ведро за прошедшее время и списать `cost`.
+    Возвращает новое число токенов и результат.
+    """
+    tokens = min(burst, tokens + (now - updated) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    return tokens, RateLimitResult(
+        allowed=allowed,
+        limit=burst,
+        remaining=int(tokens),
+        retry_after=0.0 if allowed else (cost - tokens) / rate,
+        reset_after=(burst - tokens) / rate,
+    )
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    async def consume(self, key: str, rate: float, burst: int, cost: int = 1) -> RateLimitResult:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Ведра в памяти воркера; самые давние ключи вытесняются после `max_keys`."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def consume(self, key: str, rate: float, burst: int, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(burst), now))
+        tokens, result = take_tokens(tokens, updated, now, rate, burst, cost)
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return result
+
+
+# Тот же шаг token bucket, но атомарно на стороне Redis
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Общие для всех gunicorn-воркеров ведра в Redis."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        from redis import asyncio as aioredis
+
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+        self._script = self.redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def consume(self, key: str, rate: float, burst: int, cost: int = 1) -> RateLimitResult:
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key],
+            args=[rate, burst, cost, time.time()],
+        )
+        tokens = float(tokens)
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=burst,
+            remaining=int(tokens),
+            retry_after=0.0 if allowed else (cost - tokens) / rate,
+            reset_after=(burst - tokens) / rate,
+        )
+
+    async def aclose(self) -> None:
+        await self.redis.aclose()
+
+
+def build_rate_limit_backend(config: RateLimitConfig, redis_url: str) -> RateLimitBackend:
+    if config.backend == "redis":
+        return RedisRateLimitBackend(redis_url)
+    return MemoryRateLimitBackend(max_keys=config.max_keys)
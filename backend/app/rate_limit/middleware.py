@@ -0,0 +1,166 @@
+import json
+import math
+from typing import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import RateLimitConfig, RateLimitRule
+
+from .engine import RateLimitBackend, RateLimitResult
+
+
+def client_ip(scope: Scope, trust_forwarded_for: bool) -> str:
+    if trust_forwarded_for:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                # nginx дописывает адрес клиента в конец ($proxy_add_x_forwarded_for),
+                # а начало списка клиент может подделать
+                return value.decode("latin-1").split(",")[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def body_merchants(body: bytes) -> tuple[dict[str, int], int]:
+    """
+    Достаёт `merchant_id` из JSON-тела и стоимость запроса: для пакетных
+    запросов — число элементов. Возвращает {merchant_id: число элементов}.
+    Сырой `token` ключом не служит: его проверяет только банк, а новый
+    токен на каждый запрос давал бы клиенту новое ведро.
+    """
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {}, 1
+    if not isinstance(data, dict):
+        return {}, 1
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        items = [data]
+    merchants: dict[str, int] = {}
+    for item in items:
+        merchant_id = item.get("merchant_id") if isinstance(item, dict) else None
+        if isinstance(merchant_id, str):
+            merchants[merchant_id] = merchants.get(merchant_id, 0) + 1
+    return merchants, len(items)
+
+
+def rate_limit_headers(result: RateLimitResult, rule: RateLimitRule) -> list[tuple[bytes, bytes]]:
+    window = math.ceil(rule.burst / rule.rate)
+    headers = [
+        (b"ratelimit-limit", str(result.limit).encode()),
+        (b"ratelimit-remaining", str(result.remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+        (b"ratelimit-policy", f"{rule.burst};w={window}".encode()),
+    ]
+    if not result.allowed:
+        headers.append((b"retry-after", str(max(1, math.ceil(result.retry_after))).encode()))
+    return headers
+
+
+class RateLimitMiddleware:
+    """
+    Ограничение частоты запросов по правилам из settings.rate_limit.
+
+    Каждый запрос списывается с ведра IP клиента (из X-Forwarded-For) и, если
+    в теле есть `merchant_id` из настроенных мерчантов, — ещё и с ведра мерчанта.
+    Непроверенные значения (X-API-Key, сырой `token`) ключом не служат.
+    Пакет дороже `burst` не пройдёт никогда, поэтому сразу получает 413. Бэкенд (память или Redis) берётся из
+    `app.state.rate_limit_backend`, который создаётся в lifespan.
+    """
+
+    def __init__(self, app: ASGIApp, config: RateLimitConfig, merchants: Iterable[str] = ()):
+        self.app = app
+        self.config = config
+        self.merchants = frozenset(merchants)
+
+    def match(self, path: str) -> RateLimitRule | None:
+        for rule in self.config.rules:
+            if path.startswith(rule.path):
+                return rule
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.match(scope["path"])
+        backend: RateLimitBackend | None = getattr(scope["app"].state, "rate_limit_backend", None)
+        if rule is None or backend is None:
+            await self.app(scope, receive, send)
+            return
+
+        merchants, cost = {}, 1
+        if scope["method"] == "POST":
+            body, receive = await buffer_body(receive)
+            merchants, cost = body_merchants(body)
+
+        if cost > rule.burst:
+            await send_json(send, 413, {
+                "detail": f"Слишком большой пакет: не больше {rule.burst} элементов за запрос",
+            })
+            return
+
+        identities = [("ip:" + client_ip(scope, self.config.trust_forwarded_for), cost)]
+        identities += [
+            ("merchant:" + merchant_id, count)
+            for merchant_id, count in merchants.items()
+            if merchant_id in self.merchants
+        ]
+        for identity, identity_cost in identities:
+            result = await backend.consume(
+                f"{rule.path}:{identity}",
+                rate=rule.rate,
+                burst=rule.burst,
+                cost=identity_cost,
+            )
+            if not result.allowed:
+                break
+        headers = rate_limit_headers(result, rule)
+
+        if not result.allowed:
+            await send_json(send, 429, {"detail": "Слишком много запросов. Повторите позже."}, headers)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+async def send_json(send: Send, status: int, content: dict, headers: list[tuple[bytes, bytes]] = ()) -> None:
+    body = json.dumps(content, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def buffer_body(receive: Receive) -> tuple[bytes, Receive]:
+    """Читает тело целиком и возвращает receive, который отдаст его приложению заново."""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
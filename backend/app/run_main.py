@@ -6,9 +6,14 @@ __all__ = (
 from config import settings
 from gunicorn_config import Application, get_app_options
 from main import main_app
+from metrics import prepare_multiproc_dir
+from static_build import build_static
 
 
 def main():
+    prepare_multiproc_dir()
+    # Один раз в мастере: воркеры отдают готовую схему и не строят её сами
+    build_static(main_app, vendor_assets=settings.docs.vendor_assets)
     Application(
         application=main_app,
         options=get_app_options(
@@ -17,6 +22,11 @@ def main():
             timeout=settings.gunicorn.timeout,
             workers=settings.gunicorn.workers,
             log_level=settings.logging.log_level,
+            graceful_timeout=settings.gunicorn.graceful_timeout,
+            keepalive=settings.gunicorn.keepalive,
+            preload_app=settings.gunicorn.preload_app,
+            max_requests=settings.gunicorn.max_requests,
+            max_requests_jitter=settings.gunicorn.max_requests_jitter,
         ),
     ).run()
 
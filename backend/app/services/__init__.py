@@ -0,0 +1,60 @@
+__all__ = (
+    "BankTokenError",
+    "BankTokenProvider",
+    "IdempotencyConflict",
+    "IdempotencyInProgress",
+    "IdempotencyStore",
+    "MqttPublisher",
+    "Outbox",
+    "OutboxConflict",
+    "OutboxJob",
+    "OutboxWorker",
+    "PublisherBusy",
+    "RetryLater",
+    "ByteLRUCache",
+    "ReviewAggregates",
+    "ReviewsCache",
+    "ReviewsSnapshot",
+    "SingleFlightCache",
+    "UnknownMerchant",
+    "build_idempotency_backend",
+    "gather_batch",
+    "iter_batch",
+    "payload_fingerprint",
+    "sign_callback",
+    "verify_signature",
+    "get_bank_tokens",
+    "get_idempotency_store",
+    "get_mqtt_publisher",
+    "get_outbox",
+    "get_qr_cache",
+    "get_qr_image_cache",
+    "get_status_dedupe",
+    "get_reviews_caches",
+)
+
+from .idempotency import (
+    IdempotencyConflict,
+    IdempotencyInProgress,
+    IdempotencyStore,
+    build_idempotency_backend,
+    payload_fingerprint,
+)
+from .review_stats import ReviewAggregates
+from .reviews_2gis import ReviewsCache, ReviewsSnapshot
+from .batch import gather_batch, iter_batch
+from .payment_status import MqttPublisher, PublisherBusy, sign_callback, verify_signature
+from .single_flight import SingleFlightCache
+from .qr_image import ByteLRUCache
+from .bank_tokens import BankTokenError, BankTokenProvider, UnknownMerchant
+from .outbox import Outbox, OutboxConflict, OutboxJob, OutboxWorker, RetryLater
+from .dependencies import (
+    get_bank_tokens,
+    get_idempotency_store,
+    get_mqtt_publisher,
+    get_outbox,
+    get_qr_cache,
+    get_qr_image_cache,
+    get_reviews_caches,
+    get_status_dedupe,
+)
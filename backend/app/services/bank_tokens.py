@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from config import BankAuthConfig, settings
+from http_clients import send_with_retry
+
+log = logging.getLogger(__name__)
+
+
+class UnknownMerchant(Exception):
+    """Для merchant_id нет профиля в settings.bank_auth.merchants."""
+
+
+class BankTokenError(Exception):
+    """Банк не выдал токен доступа."""
+
+
+@dataclass
+class BankToken:
+    value: str
+    expires_at: float
+
+    def expires_in(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+class BankTokenProvider:
+    """
+    Токены доступа Бакай для мерчантов из settings.bank_auth.
+
+    Токен живёт в памяти воркера до `expiry_margin` секунд перед истечением.
+    Одновременные запросы за токеном одного мерчанта ждут один вызов банка,
+    а фоновая задача обновляет токены заранее, чтобы запросы клиентов
+    не платили за лишний поход в банк.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, config: BankAuthConfig):
+        self.client = client
+        self.config = config
+        self.token_url = f"{settings.upstreams.bank}{config.token_path}"
+        self._tokens: dict[str, BankToken] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _fresh(self, merchant_id: str, margin: float) -> BankToken | None:
+        token = self._tokens.get(merchant_id)
+        if token is not None and token.expires_in() > margin:
+            return token
+        return None
+
+    async def get(self, merchant_id: str) -> str:
+        if merchant_id not in self.config.merchants:
+            raise UnknownMerchant(merchant_id)
+        token = self._fresh(merchant_id, self.config.expiry_margin)
+        if token is None:
+            token = await self.refresh(merchant_id, self.config.expiry_margin)
+        return token.value
+
+    def invalidate(self, merchant_id: str, value: str | None = None) -> None:
+        """
+        Забывает токен мерчанта. С `value` — только если закэширован именно он:
+        одновременные отказы по старому токену не выбросят уже обновлённый.
+        """
+        token = self._tokens.get(merchant_id)
+        if token is not None and (value is None or token.value == value):
+            del self._tokens[merchant_id]
+
+    async def refresh(self, merchant_id: str, margin: float = 0) -> BankToken:
+        """Запрашивает новый токен, если у уже полученного осталось не больше `margin` секунд."""
+        lock = self._locks.setdefault(merchant_id, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, токен мог обновить другой запрос
+            token = self._fresh(merchant_id, margin)
+            if token is None:
+                token = self._tokens[merchant_id] = await self._fetch(merchant_id)
+            return token
+
+    async def _fetch(self, merchant_id: str) -> BankToken:
+        credentials = self.config.merchants[merchant_id]
+        try:
+            response = await send_with_retry(
+                self.client,
+                "POST",
+                self.token_url,
+                upstream=settings.http.bank,
+                json={
+                    "username": credentials.username,
+                    "password": credentials.password.get_secret_value(),
+                },
+            )
+        except httpx.HTTPError as e:
+            raise BankTokenError(f"{merchant_id}: {e}") from e
+        if response.status_code != 200:
+            raise BankTokenError(f"{merchant_id}: код ответа {response.status_code}")
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = response.text.strip()
+        if isinstance(data, dict):
+            value = data.get("access_token") or data.get("token")
+            ttl = data.get("expires_in") or self.config.default_ttl
+        else:
+            value, ttl = data, self.config.default_ttl
+        if not value or not isinstance(value, str):
+            raise BankTokenError(f"{merchant_id}: в ответе нет токена")
+        log.info("Bank token for merchant %s refreshed, expires in %ss", merchant_id, ttl)
+        return BankToken(value=value, expires_at=time.monotonic() + float(ttl))
+
+    async def run(self) -> None:
+        """Фоновое обновление токенов, срок которых подходит к концу."""
+        while True:
+            results = await asyncio.gather(
+                *(self.refresh(m, self.config.refresh_ahead) for m in self.config.merchants),
+                return_exceptions=True,
+            )
+            for merchant_id, result in zip(self.config.merchants, results):
+                if isinstance(result, Exception):
+                    log.warning("Bank token refresh failed for %s: %s", merchant_id, result)
+            await asyncio.sleep(self.config.refresh_interval)
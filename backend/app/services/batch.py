@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence, TypeVar
+
+from fastapi import HTTPException
+
+from http_clients import CircuitOpenError
+from http_clients.throttle import HostLimiter
+
+T = TypeVar("T")
+
+
+async def run_item(
+    index: int,
+    item: T,
+    handler: Callable[[T], Awaitable[dict]],
+    limiter: HostLimiter,
+) -> dict:
+    """
+    Выполняет один элемент пакета; ошибка остаётся в его собственном результате.
+    """
+    try:
+        async with limiter.slot():
+            result = await handler(item)
+    except HTTPException as e:
+        return {"index": index, "status": e.status_code, "detail": e.detail}
+    except CircuitOpenError as e:
+        return {"index": index, "status": 503, "detail": str(e), "retry_after": round(e.retry_after, 1)}
+    except Exception as e:
+        return {"index": index, "status": 500, "detail": str(e)}
+    return {"index": index, "status": 200, **result}
+
+
+async def iter_batch(
+    items: Sequence[T],
+    handler: Callable[[T], Awaitable[dict]],
+    limiter: HostLimiter,
+) -> AsyncIterator[dict]:
+    """Результаты в порядке завершения."""
+    tasks = [
+        asyncio.create_task(run_item(index, item, handler, limiter))
+        for index, item in enumerate(items)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def gather_batch(
+    items: Sequence[T],
+    handler: Callable[[T], Awaitable[dict]],
+    limiter: HostLimiter,
+) -> list[dict[str, Any]]:
+    """Результаты в порядке элементов запроса."""
+    return list(await asyncio.gather(*(
+        run_item(index, item, handler, limiter)
+        for index, item in enumerate(items)
+    )))
@@ -0,0 +1,41 @@
+from fastapi import Request
+
+from .bank_tokens import BankTokenProvider
+from .idempotency import IdempotencyBackend, IdempotencyStore
+from .outbox import Outbox
+from .payment_status import MqttPublisher
+from .qr_image import ByteLRUCache
+from .single_flight import SingleFlightCache
+from .reviews_2gis import ReviewsCache
+
+
+def get_reviews_caches(request: Request) -> dict[str, ReviewsCache] | None:
+    return getattr(request.app.state, "reviews_caches", None)
+
+
+def get_idempotency_store(request: Request) -> IdempotencyStore | None:
+    return getattr(request.app.state, "idempotency", None)
+
+
+def get_mqtt_publisher(request: Request) -> MqttPublisher | None:
+    return getattr(request.app.state, "mqtt_publisher", None)
+
+
+def get_status_dedupe(request: Request) -> IdempotencyBackend:
+    return request.app.state.status_dedupe
+
+
+def get_qr_cache(request: Request) -> SingleFlightCache | None:
+    return getattr(request.app.state, "qr_cache", None)
+
+
+def get_qr_image_cache(request: Request) -> ByteLRUCache:
+    return request.app.state.qr_image_cache
+
+
+def get_bank_tokens(request: Request) -> BankTokenProvider | None:
+    return getattr(request.app.state, "bank_tokens", None)
+
+
+def get_outbox(request: Request) -> Outbox | None:
+    return getattr(request.app.state, "outbox", None)
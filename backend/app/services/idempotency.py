@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable
+
+from config import IdempotencyConfig
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже использован с другим телом запроса."""
+
+
+class IdempotencyInProgress(Exception):
+    """Запрос с этим ключом выполняется другим воркером слишком долго."""
+
+
+@dataclass
+class IdempotencyRecord:
+    fingerprint: str
+    done: bool
+    result: Any = None
+
+
+def payload_fingerprint(payload: dict) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class IdempotencyBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> IdempotencyRecord | None:
+        ...
+
+    @abstractmethod
+    async def reserve(self, key: str, fingerprint: str, ttl: int) -> bool:
+        """Атомарно занимает ключ; False, если он уже занят."""
+
+    @abstractmethod
+    async def complete(self, key: str, fingerprint: str, result: Any, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class MemoryIdempotencyBackend(IdempotencyBackend):
+    """
+    Ограниченное по размеру TTL-хранилище в памяти воркера.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[IdempotencyRecord, float]] = OrderedDict()
+
+    def _set(self, key: str, record: IdempotencyRecord, ttl: int) -> None:
+        self._entries[key] = (record, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> IdempotencyRecord | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return record
+
+    async def reserve(self, key: str, fingerprint: str, ttl: int) -> bool:
+        if await self.get(key) is not None:
+            return False
+        self._set(key, IdempotencyRecord(fingerprint=fingerprint, done=False), ttl)
+        return True
+
+    async def complete(self, key: str, fingerprint: str, result: Any, ttl: int) -> None:
+        self._set(key, IdempotencyRecord(fingerprint=fingerprint, done=True, result=result), ttl)
+
+    async def release(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class RedisIdempotencyBackend(IdempotencyBackend):
+    """
+    Общее для всех gunicorn-воркеров хранилище в Redis.
+    """
+
+    def __init__(self, url: str, prefix: str = "idempotency:"):
+        from redis import asyncio as aioredis
+
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> IdempotencyRecord | None:
+        raw = await self.redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        return IdempotencyRecord(**json.loads(raw))
+
+    async def reserve(self, key: str, fingerprint: str, ttl: int) -> bool:
+        record = IdempotencyRecord(fingerprint=fingerprint, done=False)
+        return bool(await self.redis.set(self.prefix + key, json.dumps(asdict(record)), nx=True, ex=ttl))
+
+    async def complete(self, key: str, fingerprint: str, result: Any, ttl: int) -> None:
+        record = IdempotencyRecord(fingerprint=fingerprint, done=True, result=result)
+        await self.redis.set(self.prefix + key, json.dumps(asdict(record)), ex=ttl)
+
+    async def release(self, key: str) -> None:
+        await self.redis.delete(self.prefix + key)
+
+    async def aclose(self) -> None:
+        await self.redis.aclose()
+
+
+def build_idempotency_backend(config: IdempotencyConfig, redis_url: str) -> IdempotencyBackend:
+    if config.backend == "redis":
+        return RedisIdempotencyBackend(redis_url)
+    return MemoryIdempotencyBackend(max_size=config.max_size)
+
+
+class IdempotencyStore:
+    """
+    Выполняет `call` не больше одного раза на ключ.
+
+    Одинаковые запросы внутри воркера ждут один и тот же future, между
+    воркерами — общую запись в бэкенде. Успешный (не None) результат
+    кэшируется на `ttl` секунд, неудачный не запоминается, чтобы клиент
+    мог повторить запрос. Отмена ожидающего (клиент отключился) `call` не
+    прерывает: он доводится в фоне и его результат записывается под ключом.
+    """
+
+    def __init__(self, backend: IdempotencyBackend, config: IdempotencyConfig):
+        self.backend = backend
+        self.config = config
+        self._inflight: dict[str, tuple[str, asyncio.Future]] = {}
+        self._detached: set[asyncio.Task] = set()
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        call: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Возвращает (результат, повторный_ли_это_ответ).
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            inflight_fingerprint, future = inflight
+            if inflight_fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # Отменили ведущий запрос, а не нас — пробуем сами
+                if not future.cancelled():
+                    raise
+                return await self.run(key, fingerprint, call)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            result, replayed = await self._run_shared(key, fingerprint, call)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Ожидающих может не быть — помечаем исключение как полученное
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, replayed
+        finally:
+            del self._inflight[key]
+
+    async def _run_shared(
+        self,
+        key: str,
+        fingerprint: str,
+        call: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        deadline = time.monotonic() + self.config.pending_ttl
+        while True:
+            record = await self.backend.get(key)
+            if record is None:
+                if await self.backend.reserve(key, fingerprint, self.config.pending_ttl):
+                    break
+                continue
+            if record.fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            if record.done:
+                return record.result, True
+            if time.monotonic() > deadline:
+                raise IdempotencyInProgress(key)
+            await asyncio.sleep(self.config.poll_interval)
+
+        task = asyncio.ensure_future(call())
+        try:
+            # Запрос к банку мог уже уйти: отмена не должна освобождать ключ,
+            # иначе повтор клиента создаст второй платёж
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            self._finish_detached(key, fingerprint, task)
+            raise
+        except BaseException:
+            await self.backend.release(key)
+            raise
+        await self._record(key, fingerprint, result)
+        return result, False
+
+    async def _record(self, key: str, fingerprint: str, result: Any) -> None:
+        if result is None:
+            await self.backend.release(key)
+        else:
+            await self.backend.complete(key, fingerprint, result, self.config.ttl)
+
+    def _finish_detached(self, key: str, fingerprint: str, task: asyncio.Future) -> None:
+        async def finish() -> None:
+            try:
+                result = await task
+            except BaseException:
+                await self.backend.release(key)
+                return
+            await self._record(key, fingerprint, result)
+
+        detached = asyncio.ensure_future(finish())
+        self._detached.add(detached)
+        detached.add_done_callback(self._detached.discard)
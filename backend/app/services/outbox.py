@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Literal
+
+from app_logging import request_id_var
+from config import OutboxConfig
+
+log = logging.getLogger(__name__)
+
+JobStatus = Literal["pending", "running", "done", "failed"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL UNIQUE,
+    fingerprint TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_attempt_at);
+"""
+
+
+class OutboxConflict(Exception):
+    """dedupe_key уже поставлен в очередь с другими параметрами."""
+
+
+class RetryLater(Exception):
+    """Задачу стоит повторить: апстрим недоступен."""
+
+    def __init__(self, reason: str, delay: float | None = None):
+        super().__init__(reason)
+        self.delay = delay
+
+
+@dataclass
+class OutboxJob:
+    id: str
+    status: JobStatus
+    attempts: int
+    payload: dict
+    result: Any = None
+    error: str | None = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "OutboxJob":
+        return cls(
+            id=row["id"],
+            status=row["status"],
+            attempts=row["attempts"],
+            payload=json.loads(row["payload"]),
+            result=json.loads(row["result"]) if row["result"] is not None else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+
+class Outbox:
+    """
+    Журнал отложенных задач в SQLite (WAL), переживает перезапуск.
+
+    Файл общий для всех gunicorn-воркеров: задачу забирают атомарным
+    UPDATE ... RETURNING с арендой на `lease` секунд; если воркер умер,
+    аренда истекает и задачу подхватывает другой. Вызовы sqlite3
+    синхронные, поэтому идут в пуле потоков под одной блокировкой.
+    """
+
+    def __init__(self, config: OutboxConfig):
+        self.config = config
+        directory = os.path.dirname(config.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(config.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        def locked():
+            with self._lock:
+                return func(*args)
+        return await asyncio.to_thread(locked)
+
+    async def enqueue(self, dedupe_key: str, fingerprint: str, payload: dict) -> tuple[OutboxJob, bool]:
+        """Возвращает (задача, новая_ли); повтор с тем же ключом отдаёт уже созданную задачу."""
+        return await self._run(self._enqueue, dedupe_key, fingerprint, payload)
+
+    def _enqueue(self, dedupe_key: str, fingerprint: str, payload: dict) -> tuple[OutboxJob, bool]:
+        now = time.time()
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO jobs (id, dedupe_key, fingerprint, payload, status, created_at, updated_at, next_attempt_at)"
+            " VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)",
+            (uuid.uuid4().hex, dedupe_key, fingerprint, json.dumps(payload, ensure_ascii=False), now, now, now),
+        )
+        row = self._db.execute("SELECT * FROM jobs WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+        if row["fingerprint"] != fingerprint:
+            raise OutboxConflict(dedupe_key)
+        return OutboxJob.from_row(row), cursor.rowcount == 1
+
+    async def get(self, job_id: str) -> OutboxJob | None:
+        return await self._run(self._get, job_id)
+
+    def _get(self, job_id: str) -> OutboxJob | None:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return OutboxJob.from_row(row) if row else None
+
+    async def claim(self, limit: int) -> list[OutboxJob]:
+        return await self._run(self._claim, limit)
+
+    def _claim(self, limit: int) -> list[OutboxJob]:
+        now = time.time()
+        # Готовые к повтору задачи и задачи с просроченной арендой (воркер умер)
+        rows = self._db.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ?"
+            " WHERE id IN ("
+            "   SELECT id FROM jobs"
+            "   WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'running' AND lease_until < ?)"
+            "   ORDER BY next_attempt_at LIMIT ?"
+            " ) RETURNING *",
+            (now + self.config.lease, now, now, now, limit),
+        ).fetchall()
+        return [OutboxJob.from_row(row) for row in rows]
+
+    async def complete(self, job_id: str, result: Any) -> None:
+        await self._run(
+            self._finish, job_id, "done", json.dumps(result, ensure_ascii=False), None,
+        )
+
+    async def fail(self, job_id: str, error: str) -> None:
+        await self._run(self._finish, job_id, "failed", None, error)
+
+    def _finish(self, job_id: str, status: JobStatus, result: str | None, error: str | None) -> None:
+        self._db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, lease_until = 0 WHERE id = ?",
+            (status, result, error, time.time(), job_id),
+        )
+
+    async def retry(self, job_id: str, error: str, delay: float) -> None:
+        await self._run(self._retry, job_id, error, delay)
+
+    def _retry(self, job_id: str, error: str, delay: float) -> None:
+        now = time.time()
+        self._db.execute(
+            "UPDATE jobs SET status = 'pending', error = ?, updated_at = ?, next_attempt_at = ?, lease_until = 0"
+            " WHERE id = ?",
+            (error, now, now + delay, job_id),
+        )
+
+    async def replay(self) -> int:
+        """После перезапуска возвращает в очередь задачи, брошенные на середине."""
+        return await self._run(self._replay)
+
+    def _replay(self) -> int:
+        now = time.time()
+        return self._db.execute(
+            "UPDATE jobs SET status = 'pending', next_attempt_at = ?, lease_until = 0"
+            " WHERE status = 'running' AND lease_until < ?",
+            (now, now),
+        ).rowcount
+
+    async def compact(self) -> int:
+        """Удаляет завершённые задачи старше `retention` и сжимает WAL."""
+        return await self._run(self._compact)
+
+    def _compact(self) -> int:
+        deleted = self._db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+            (time.time() - self.config.retention,),
+        ).rowcount
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    async def counts(self) -> dict[str, int]:
+        return await self._run(self._counts)
+
+    def _counts(self) -> dict[str, int]:
+        rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+JobHandler = Callable[[OutboxJob], Awaitable[Any]]
+JobListener = Callable[[OutboxJob], Awaitable[None]]
+
+
+class OutboxWorker:
+    """
+    Разбирает outbox не больше чем `concurrency` задачами одновременно.
+
+    Обработчик бросает RetryLater, если апстрим недоступен, — задача
+    откладывается с экспоненциальной задержкой; любое другое исключение
+    или исчерпанные `max_attempts` завершают задачу со статусом failed.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        handler: JobHandler,
+        on_finished: JobListener | None = None,
+    ):
+        self.outbox = outbox
+        self.config = outbox.config
+        self.handler = handler
+        self.on_finished = on_finished
+        self._tasks: set[asyncio.Task] = set()
+        # Пока апстрим недоступен, не забираем новые задачи
+        self._paused_until = 0.0
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.config.retry_max_delay, self.config.retry_base_delay * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def process(self, job: OutboxJob) -> None:
+        # У фоновой задачи нет входящего запроса — в логах и у апстрима её видно по id задачи
+        request_id_var.set(job.id)
+        try:
+            result = await self.handler(job)
+        except RetryLater as e:
+            if job.attempts >= self.config.max_attempts:
+                await self.outbox.fail(job.id, str(e))
+                job.status, job.error = "failed", str(e)
+            else:
+                delay = e.delay if e.delay is not None else self.backoff(job.attempts)
+                self._paused_until = max(self._paused_until, time.monotonic() + min(delay, self.config.retry_base_delay))
+                await self.outbox.retry(job.id, str(e), delay)
+                return
+        except Exception as e:
+            log.exception("Outbox job %s failed", job.id)
+            await self.outbox.fail(job.id, str(e))
+            job.status, job.error = "failed", str(e)
+        else:
+            await self.outbox.complete(job.id, result)
+            job.status, job.result = "done", result
+
+        if self.on_finished is not None:
+            try:
+                await self.on_finished(job)
+            except Exception:
+                log.warning("Outbox listener failed for job %s", job.id, exc_info=True)
+
+    async def run(self) -> None:
+        replayed = await self.outbox.replay()
+        if replayed:
+            log.info("Outbox: %s unfinished jobs returned to the queue", replayed)
+        next_compact = time.monotonic() + self.config.compact_interval
+        try:
+            while True:
+                if time.monotonic() >= next_compact:
+                    deleted = await self.outbox.compact()
+                    log.info("Outbox compacted, %s finished jobs removed", deleted)
+                    next_compact = time.monotonic() + self.config.compact_interval
+
+                free = self.config.concurrency - len(self._tasks)
+                jobs = []
+                if free > 0 and time.monotonic() >= self._paused_until:
+                    jobs = await self.outbox.claim(free)
+                for job in jobs:
+                    task = asyncio.create_task(self.process(job))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                if free <= len(jobs) and self._tasks:
+                    # Все слоты заняты — ждём, пока освободится хотя бы один
+                    await asyncio.wait(
+                        self._tasks,
+                        timeout=self.config.poll_interval,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                elif not jobs:
+                    await asyncio.sleep(self.config.poll_interval)
+        finally:
+            # Незавершённые задачи останутся running и вернутся в очередь по истечении аренды
+            for task in self._tasks:
+                task.cancel()
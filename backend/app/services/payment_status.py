@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+
+import aiomqtt
+
+from config import MqttConfig
+
+log = logging.getLogger(__name__)
+
+
+class PublisherBusy(Exception):
+    """Очередь публикации заполнена — отправитель должен повторить позже."""
+
+
+def sign_callback(body: bytes, merchant_id: str, timestamp: str, secret: str) -> str:
+    """
+    HMAC-SHA256 от «<timestamp>.<merchant_id>.<тело>»: подпись привязана
+    к мерчанту из URL и ко времени отправки, её не переложить на чужой топик.
+    """
+    message = f"{timestamp}.{merchant_id}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_signature(
+    body: bytes,
+    signature: str | None,
+    secret: str,
+    merchant_id: str,
+    timestamp: str | None,
+    tolerance: float,
+) -> bool:
+    if not signature or not timestamp:
+        return False
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        return False
+    # Старую подпись не принимаем: перехваченное уведомление не повторить позже
+    if abs(time.time() - sent_at) > tolerance:
+        return False
+    expected = sign_callback(body, merchant_id, timestamp, secret)
+    return hmac.compare_digest(expected, signature.lower())
+
+
+class MqttPublisher:
+    """
+    Одно постоянное MQTT-соединение на воркер.
+
+    Обработчики запросов только кладут сообщение в ограниченную очередь;
+    если брокер не успевает и очередь заполнена, `publish` через
+    `enqueue_timeout` секунд бросает PublisherBusy. Фоновая задача держит
+    соединение, переподключается с экспоненциальной задержкой и публикует
+    с QoS 1, не больше `max_inflight` сообщений одновременно.
+    """
+
+    def __init__(self, config: MqttConfig):
+        self.config = config
+        self.queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue(maxsize=config.queue_size)
+        self.connected = False
+
+    def topic_for(self, merchant_id: str, kind: str = "status") -> str:
+        return f"{self.config.topic_prefix}/{merchant_id}/{kind}"
+
+    async def publish(self, topic: str, message: dict) -> None:
+        payload = json.dumps(message, ensure_ascii=False).encode()
+        try:
+            await asyncio.wait_for(self.queue.put((topic, payload)), self.config.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise PublisherBusy(topic)
+
+    async def run(self) -> None:
+        delay = self.config.reconnect_delay
+        while True:
+            try:
+                async with aiomqtt.Client(
+                    hostname=self.config.host,
+                    port=self.config.port,
+                    username=self.config.username,
+                    password=self.config.password.get_secret_value() if self.config.password else None,
+                    identifier=f"payment-status-{os.getpid()}",
+                    max_inflight_messages=self.config.max_inflight,
+                ) as client:
+                    self.connected = True
+                    delay = self.config.reconnect_delay
+                    log.info("MQTT connected to %s:%s", self.config.host, self.config.port)
+                    # Ошибка одного отправителя отменяет остальные до переподключения
+                    async with asyncio.TaskGroup() as tasks:
+                        for _ in range(self.config.max_inflight):
+                            tasks.create_task(self._drain(client))
+            except* aiomqtt.MqttError:
+                log.warning("MQTT connection lost, reconnecting in %.1fs", delay, exc_info=True)
+            finally:
+                self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config.max_reconnect_delay)
+
+    async def _drain(self, client: aiomqtt.Client) -> None:
+        while True:
+            topic, payload = await self.queue.get()
+            try:
+                await client.publish(topic, payload, qos=1)
+            except (aiomqtt.MqttError, asyncio.CancelledError):
+                # Сообщение не подтверждено брокером (или соседний отправитель
+                # упал и нас отменили) — вернём его в очередь и отправим после
+                # переподключения
+                try:
+                    self.queue.put_nowait((topic, payload))
+                except asyncio.QueueFull:
+                    log.error("MQTT queue full, dropping message for %s", topic)
+                raise
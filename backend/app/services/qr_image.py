@@ -0,0 +1,62 @@
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Literal
+
+import segno
+
+from config import QrImageConfig
+
+ImageFormat = Literal["png", "svg"]
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+class ByteLRUCache:
+    """LRU-кэш, ограниченный суммарным размером значений в байтах."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+def image_key(data: str, size: int, fmt: ImageFormat) -> str:
+    return hashlib.sha256(f"{fmt}:{size}:{data}".encode()).hexdigest()
+
+
+def render_qr(data: str, size: int, fmt: ImageFormat, config: QrImageConfig) -> bytes:
+    """
+    Рисует QR со стороной около `size` пикселей (для SVG — в единицах viewBox);
+    модуль не бывает меньше пикселя, поэтому плотный QR может выйти крупнее.
+    """
+    qr = segno.make(data, error=config.error_correction, micro=False)
+    modules, _ = qr.symbol_size(scale=1, border=config.border)
+    scale = max(1, size // modules)
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        qr.save(buffer, kind="svg", scale=scale, border=config.border, xmldecl=False)
+    else:
+        qr.save(buffer, kind="png", scale=scale, border=config.border)
+    return buffer.getvalue()
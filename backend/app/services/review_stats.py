@@ -0,0 +1,76 @@
+import heapq
+from collections import Counter
+
+
+class ReviewAggregates:
+    """
+    Сводка по нормализованным отзывам, пополняется по одному отзыву за раз.
+
+    Гистограмма оценок, счётчики по месяцам и доля отзывов с официальным
+    ответом считаются на лету; для каждой оценки хранится не больше
+    `top_n` самых свежих отзывов в min-куче по `date_created`.
+    Повторно пришедшие отзывы (граница инкрементальной докачки) не учитываются.
+    """
+
+    def __init__(self, top_n: int):
+        self.top_n = top_n
+        self.total = 0
+        self.answered = 0
+        self.ratings: Counter[int] = Counter()
+        self.months: Counter[str] = Counter()
+        self._latest: dict[int, list[tuple[str, str, dict]]] = {}
+        self._seen: set[str] = set()
+
+    def add(self, review: dict) -> None:
+        review_id = review.get("id")
+        if review_id in self._seen:
+            return
+        self._seen.add(review_id)
+
+        self.total += 1
+        if review.get("official_answer"):
+            self.answered += 1
+        rating = review.get("rating")
+        self.ratings[rating] += 1
+        date_created = review.get("date_created") or ""
+        if date_created:
+            self.months[date_created[:7]] += 1
+
+        self._keep_latest(rating, (date_created, review_id, review))
+
+    def _keep_latest(self, rating: int, item: tuple[str, str, dict]) -> None:
+        heap = self._latest.setdefault(rating, [])
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    def latest(self, rating: int, limit: int | None = None) -> list[dict]:
+        # Сортируются только top_n элементов кучи, а не все отзывы
+        items = heapq.nlargest(limit or self.top_n, self._latest.get(rating, []), key=lambda i: i[:2])
+        return [review for _, _, review in items]
+
+    def as_dict(self, latest: int | None = None) -> dict:
+        return {
+            "total": self.total,
+            "rating_histogram": {str(r): self.ratings.get(r, 0) for r in range(1, 6)},
+            "by_month": dict(sorted(self.months.items())),
+            "official_answer_share": round(self.answered / self.total, 4) if self.total else 0.0,
+            "latest": {str(r): self.latest(r, latest) for r in range(5, 0, -1)},
+        }
+
+
+def merge_aggregates(parts: list[ReviewAggregates]) -> ReviewAggregates:
+    """Сводка по нескольким организациям без повторного прохода по отзывам."""
+    if len(parts) == 1:
+        return parts[0]
+    merged = ReviewAggregates(top_n=max(p.top_n for p in parts))
+    for part in parts:
+        merged.total += part.total
+        merged.answered += part.answered
+        merged.ratings.update(part.ratings)
+        merged.months.update(part.months)
+        for rating, heap in part._latest.items():
+            for item in heap:
+                merged._keep_latest(rating, item)
+    return merged
@@ -0,0 +1,366 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import heapq
+import json
+import logging
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import AsyncIterator, TypeVar
+
+import httpx
+import orjson
+
+from config import GisReviewsConfig, ReviewsCacheConfig, settings
+from http_cache import gzip_body
+from http_clients.throttle import HostLimiter, host_limiters
+
+from .review_stats import ReviewAggregates
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+API_KEY = settings.API_KEY_2GIS
+REVIEWS_FIELDS = "meta.org_rating,meta.org_reviews_count"
+
+
+def reviews_url(org_id: str) -> str:
+    return f"{settings.upstreams.gis}/2.0/orgs/{org_id}/reviews"
+
+
+def first_params(config: GisReviewsConfig, rating: int | None = None) -> dict:
+    params = {
+        "key": API_KEY,
+        "rated": "true",
+        "limit": config.page_size,
+        "sort_by": "date_created",
+        "fields": REVIEWS_FIELDS,
+    }
+    if rating is not None and config.rating_param:
+        params[config.rating_param] = rating
+    return params
+
+
+def gis_limiter(config: GisReviewsConfig) -> HostLimiter:
+    return host_limiters.get(httpx.URL(settings.upstreams.gis).host, config.throttle)
+
+
+def normalize_review(r: dict, org_id: str | None = None) -> dict:
+    return {
+        "id": r.get("id"),
+        "org_id": org_id,
+        "date_created": r.get("date_created"),
+        "date_edited": r.get("date_edited"),
+        "rating": r.get("rating"),
+        "text": (r.get("text") or "").replace("\n", " "),
+        "user_name": r.get("user", {}).get("name"),
+        "comments_count": r.get("comments_count"),
+        "official_answer": (r.get("official_answer") or {}).get("text"),
+    }
+
+
+async def iter_review_pages(
+    client: httpx.AsyncClient,
+    org_id: str,
+    rating: int | None = None,
+    config: GisReviewsConfig = settings.gis_reviews,
+) -> AsyncIterator[list[dict]]:
+    """
+    Отдаёт страницы отзывов организации по `next_link`, от новых к старым.
+    Каждый запрос занимает слот общего лимитера хоста 2GIS.
+    """
+    limiter = gis_limiter(config)
+    url, params = reviews_url(org_id), first_params(config, rating)
+    while url:
+        async with limiter.slot():
+            resp = await client.get(url, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+
+        yield data.get("reviews", [])
+
+        # next_link уже содержит все параметры, включая ключ
+        url, params = data.get("meta", {}).get("next_link"), None
+
+
+async def fetch_five_star_reviews(client: httpx.AsyncClient, org_id: str):
+    reviews_5 = []
+    async for page in iter_review_pages(client, org_id, rating=5):
+        for r in page:
+            if r.get("rating") == 5:
+                reviews_5.append(normalize_review(r, org_id))
+    return reviews_5
+
+
+async def aggregate_reviews(client: httpx.AsyncClient, org_id: str, top_n: int) -> ReviewAggregates:
+    """Сводка за один проход по страницам, без хранения всех отзывов."""
+    aggregates = ReviewAggregates(top_n=top_n)
+    async for page in iter_review_pages(client, org_id):
+        for r in page:
+            aggregates.add(normalize_review(r, org_id))
+    return aggregates
+
+
+def encode_cursor(review: dict) -> str:
+    raw = json.dumps([review.get("date_created"), review.get("id")])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str | None, str | None]:
+    """
+    Курсор — позиция последнего отданного отзыва: (date_created, id).
+    Бросает ValueError на битом курсоре.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_created, review_id = json.loads(raw)
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError("invalid cursor")
+    return date_created, review_id
+
+
+def is_after_cursor(review: dict, cursor: tuple[str | None, str | None]) -> bool:
+    """
+    Отзывы идут от новых к старым: всё, что старше курсора, — следующая страница.
+    """
+    date_created, _ = cursor
+    return bool(date_created and review.get("date_created") and review["date_created"] < date_created)
+
+
+async def stream_five_star_reviews(
+    pages: AsyncIterator[list[dict]],
+    org_id: str | None = None,
+    limit: int | None = None,
+    cursor: tuple[str | None, str | None] | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Отдаёт пятизвёздочные отзывы по мере прихода страниц 2GIS,
+    в памяти держится не больше одной страницы.
+    """
+    passed_cursor = cursor is None
+    sent = 0
+    async for page in pages:
+        for r in page:
+            if not passed_cursor:
+                if r.get("id") == cursor[1]:
+                    passed_cursor = True
+                    continue
+                if not is_after_cursor(r, cursor):
+                    continue
+                passed_cursor = True
+            if r.get("rating") != 5:
+                continue
+            yield normalize_review(r, org_id)
+            sent += 1
+            if limit is not None and sent >= limit:
+                return
+
+
+async def interleave(streams: list[AsyncIterator[T]]) -> AsyncIterator[T]:
+    """
+    Сливает несколько потоков в один в порядке готовности элементов.
+    Источники читаются параллельно; ошибка любого из них обрывает общий поток.
+    """
+    queue: asyncio.Queue[tuple[bool, T | BaseException | None]] = asyncio.Queue(maxsize=len(streams))
+
+    async def pump(stream: AsyncIterator[T]) -> None:
+        try:
+            async for item in stream:
+                await queue.put((True, item))
+        except Exception as e:
+            await queue.put((False, e))
+        else:
+            await queue.put((False, None))
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            is_item, value = await queue.get()
+            if is_item:
+                yield value
+            elif value is not None:
+                raise value
+            else:
+                remaining -= 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@dataclass(frozen=True)
+class ReviewsSnapshot:
+    reviews: list[dict]
+    newest_date: str | None
+    etag: str
+    body: bytes
+    positions: dict[str, int]
+
+    @cached_property
+    def gzipped(self) -> bytes:
+        # Сжимаем один раз на снимок, а не на каждый запрос
+        return gzip_body(self.body, settings.http_cache.gzip_level)
+
+    def page(
+        self,
+        limit: int | None,
+        cursor: tuple[str | None, str | None] | None,
+    ) -> tuple[list[dict], str | None]:
+        start = 0
+        if cursor is not None:
+            position = self.positions.get(cursor[1])
+            if position is not None:
+                start = position + 1
+            else:
+                # Отзыв под курсором пропал после полной пересборки снимка
+                start = next(
+                    (i for i, r in enumerate(self.reviews) if is_after_cursor(r, cursor)),
+                    len(self.reviews),
+                )
+        end = len(self.reviews) if limit is None else start + limit
+        items = self.reviews[start:end]
+        next_cursor = encode_cursor(items[-1]) if items and end < len(self.reviews) else None
+        return items, next_cursor
+
+
+def merge_snapshots(snapshots: list[ReviewsSnapshot]) -> ReviewsSnapshot:
+    """
+    Снимок по нескольким организациям: отзывы каждой уже идут от новых
+    к старым, поэтому достаточно слияния без полной сортировки.
+    """
+    if len(snapshots) == 1:
+        return snapshots[0]
+    reviews = heapq.merge(
+        *(s.reviews for s in snapshots),
+        key=lambda r: r.get("date_created") or "",
+        reverse=True,
+    )
+    newest_date = max((s.newest_date for s in snapshots if s.newest_date), default=None)
+    return build_snapshot(list(reviews), newest_date)
+
+
+def build_snapshot(reviews: list[dict], newest_date: str | None) -> ReviewsSnapshot:
+    body = orjson.dumps({"5_star_reviews": reviews})
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    return ReviewsSnapshot(
+        reviews=reviews,
+        newest_date=newest_date,
+        etag=etag,
+        body=body,
+        positions={r["id"]: i for i, r in enumerate(reviews)},
+    )
+
+
+class ReviewsCache:
+    """
+    Снимок пятизвёздочных отзывов одной организации в памяти воркера.
+
+    Фоновая задача раз в `refresh_interval` секунд докачивает только
+    страницы новее последнего закэшированного `date_created`; раз в `ttl`
+    секунд снимок перестраивается целиком, чтобы подтянуть правки и удаления.
+    В том же проходе пополняется сводка по всем оценкам (`aggregates`).
+    """
+
+    def __init__(self, client: httpx.AsyncClient, org_id: str, config: ReviewsCacheConfig):
+        self.client = client
+        self.org_id = org_id
+        self.config = config
+        self.snapshot: ReviewsSnapshot | None = None
+        self.aggregates: ReviewAggregates | None = None
+        self._refreshed_at = 0.0
+        self._full_synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._refreshed_at > self.config.ttl
+
+    async def refresh(self, force: bool = True) -> ReviewsSnapshot:
+        async with self._lock:
+            # Пока ждали блокировку, снимок мог обновить другой запрос
+            if not force and self.snapshot is not None and not self._is_stale():
+                return self.snapshot
+            full = (
+                self.snapshot is None
+                or time.monotonic() - self._full_synced_at > self.config.ttl
+            )
+            if full:
+                # Новую сводку подменяем только после успешного полного прохода
+                aggregates = self._new_aggregates()
+                self.snapshot = await self._fetch(previous=None, aggregates=aggregates)
+                self.aggregates = aggregates
+                self._full_synced_at = time.monotonic()
+            else:
+                self.snapshot = await self._fetch(previous=self.snapshot, aggregates=self.aggregates)
+            self._refreshed_at = time.monotonic()
+            return self.snapshot
+
+    def _new_aggregates(self) -> ReviewAggregates | None:
+        if not self.config.aggregates:
+            return None
+        return ReviewAggregates(top_n=self.config.aggregates_top_n)
+
+    async def _fetch(
+        self,
+        previous: ReviewsSnapshot | None,
+        aggregates: ReviewAggregates | None,
+    ) -> ReviewsSnapshot:
+        newest_known = previous.newest_date if previous else None
+        known_ids = {r["id"] for r in previous.reviews} if previous else set()
+        newest_date = newest_known
+        fresh = []
+
+        rating = None if aggregates is not None else 5
+        async for page in iter_review_pages(self.client, self.org_id, rating=rating):
+            reached_known = False
+            for r in page:
+                date_created = r.get("date_created")
+                if newest_known and date_created and date_created < newest_known:
+                    reached_known = True
+                    break
+                if date_created and (newest_date is None or date_created > newest_date):
+                    newest_date = date_created
+                review = None
+                if aggregates is not None:
+                    review = normalize_review(r, self.org_id)
+                    aggregates.add(review)
+                if r.get("rating") == 5 and r.get("id") not in known_ids:
+                    fresh.append(review or normalize_review(r, self.org_id))
+            if reached_known:
+                break
+
+        if previous is not None and not fresh and newest_date == newest_known:
+            return previous
+
+        reviews = fresh + (previous.reviews if previous else [])
+        return build_snapshot(reviews[:self.config.max_size], newest_date)
+
+    async def get(self) -> ReviewsSnapshot:
+        if self.snapshot is not None and not self._is_stale():
+            return self.snapshot
+        try:
+            return await self.refresh(force=False)
+        except httpx.HTTPError:
+            if self.snapshot is None:
+                raise
+            log.warning(
+                "2GIS refresh failed, serving stale reviews snapshot",
+                extra={"org_id": self.org_id},
+                exc_info=True,
+            )
+            return self.snapshot
+
+    async def get_aggregates(self) -> ReviewAggregates | None:
+        await self.get()
+        return self.aggregates
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except httpx.HTTPError:
+                log.warning("2GIS background refresh failed", extra={"org_id": self.org_id}, exc_info=True)
+            await asyncio.sleep(self.config.refresh_interval)
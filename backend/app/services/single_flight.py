@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Literal
+
+CacheOutcome = Literal["hit", "shared", "miss"]
+
+
+class SingleFlightCache:
+    """
+    Объединяет одинаковые одновременные вызовы в один и ненадолго
+    запоминает результат.
+
+    Время жизни записи задаёт сам результат через `ttl_for`, размер
+    ограничен `max_size` (вытесняется самая давняя запись). None и
+    исключения не кэшируются, но ожидающие одновременные вызовы получают
+    их так же, как ведущий.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_call(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        ttl_for: Callable[[Any], float],
+    ) -> tuple[Any, CacheOutcome]:
+        cached = self._get(key)
+        if cached is not None:
+            return cached, "hit"
+
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future), "shared"
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                return await self.get_or_call(key, call, ttl_for)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if result is not None:
+                self._set(key, result, ttl_for(result))
+            return result, "miss"
+        finally:
+            del self._inflight[key]
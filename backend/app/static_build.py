@@ -0,0 +1,202 @@
+"""
+Сборка статики документации: OpenAPI-схема и ассеты Swagger UI / ReDoc.
+
+Вызывается в мастере gunicorn до запуска воркеров (run_main.py), так что схема
+строится один раз, а не каждым воркером на первом запросе. Можно запустить
+и отдельно:
+    python static_build.py [--no-assets]
+    python static_build.py --bake --strict   # в Dockerfile.prod, при сборке образа
+    python static_build.py --pin             # после смены версий в DOCS_ASSETS
+
+Ассеты сверяются с sha256 из docs_assets.sha256 до записи на диск.
+"""
+import argparse
+import gzip
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import orjson
+from fastapi import FastAPI
+
+log = logging.getLogger(__name__)
+
+STATIC_DIR = Path("static")
+SCHEMA_PATH = STATIC_DIR / "openapi.json"
+DOCS_ASSETS_DIR = STATIC_DIR / "docs"
+CHECKSUMS_PATH = Path(__file__).with_name("docs_assets.sha256")
+# Ассеты, скачанные при сборке образа. Не внутри /app: в docker-compose.prod.yml
+# /app и /app/static перекрыты томами, при старте файлы копируются в static
+BAKED_ASSETS_DIR = Path("/opt/docs-assets")
+
+# Версии закреплены: вендоренные файлы и CDN-запасной вариант должны совпадать
+DOCS_ASSETS = {
+    "swagger-ui-bundle.js": "https://unpkg.com/swagger-ui-dist@5.18.2/swagger-ui-bundle.js",
+    "swagger-ui.css": "https://unpkg.com/swagger-ui-dist@5.18.2/swagger-ui.css",
+    "redoc.standalone.js": "https://unpkg.com/redoc@2.4.0/bundles/redoc.standalone.js",
+}
+
+
+def write_precompressed(path: Path, data: bytes) -> None:
+    """Файл и его .gz рядом — для gzip_static в nginx и для отдачи из приложения."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    gz_tmp = path.with_suffix(path.suffix + ".gz.tmp")
+    gz_tmp.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    gz_tmp.replace(path.with_suffix(path.suffix + ".gz"))
+
+
+def write_schema(app: FastAPI) -> Path:
+    write_precompressed(SCHEMA_PATH, orjson.dumps(app.openapi()))
+    return SCHEMA_PATH
+
+
+class AssetIntegrityError(Exception):
+    """Ассет не удалось завендорить: нет закреплённого sha256, не скачался или sha256 не совпал."""
+
+
+def load_checksums() -> dict[str, str]:
+    """sha256 ассетов в формате sha256sum: «<hex>  <имя>», строки с # — комментарии."""
+    try:
+        lines = CHECKSUMS_PATH.read_text().splitlines()
+    except FileNotFoundError:
+        return {}
+    checksums = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        digest, name = line.split(maxsplit=1)
+        checksums[name.lstrip("*")] = digest.lower()
+    return checksums
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_baked_asset(name: str, expected: str) -> bytes | None:
+    try:
+        data = (BAKED_ASSETS_DIR / name).read_bytes()
+    except FileNotFoundError:
+        return None
+    return data if sha256_hex(data) == expected else None
+
+
+def fetch_docs_assets(timeout: float = 15, strict: bool = False, target: Path = DOCS_ASSETS_DIR) -> bool:
+    """
+    Кладёт в target ассеты с закреплённым sha256: из скачанных при сборке
+    образа, иначе с unpkg. Файл без закреплённого sha256 или с другим sha256
+    на диск не пишется, устаревший удаляется — страница документации возьмёт
+    ассет с CDN. При strict любой незавендоренный ассет — AssetIntegrityError.
+    """
+    checksums = load_checksums()
+    problems = []
+    with httpx.Client(timeout=timeout, follow_redirects=True) as client:
+        for name, url in DOCS_ASSETS.items():
+            path = target / name
+            expected = checksums.get(name)
+            if expected is not None and path.exists() and sha256_hex(path.read_bytes()) == expected:
+                continue
+            path.unlink(missing_ok=True)
+            path.with_suffix(path.suffix + ".gz").unlink(missing_ok=True)
+            if expected is None:
+                problems.append(f"{name}: нет закреплённого sha256")
+                continue
+            data = read_baked_asset(name, expected) if target != BAKED_ASSETS_DIR else None
+            if data is None:
+                try:
+                    response = client.get(url)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    problems.append(f"{name}: {e}")
+                    continue
+                data = response.content
+                if sha256_hex(data) != expected:
+                    problems.append(f"{name}: sha256 {sha256_hex(data)}, ожидался {expected}")
+                    continue
+            write_precompressed(path, data)
+    if problems and strict:
+        raise AssetIntegrityError("; ".join(problems))
+    for problem in problems:
+        log.warning("Docs asset not vendored, falling back to CDN: %s", problem)
+    return not problems
+
+
+def pin_docs_assets(timeout: float = 15) -> None:
+    """Скачивает все ассеты и перезаписывает docs_assets.sha256 — diff стоит проверить глазами."""
+    lines = ["# sha256 ассетов документации из DOCS_ASSETS (static_build.py --pin)"]
+    with httpx.Client(timeout=timeout, follow_redirects=True) as client:
+        for name, url in DOCS_ASSETS.items():
+            response = client.get(url)
+            response.raise_for_status()
+            lines.append(f"{sha256_hex(response.content)}  {name}")
+    CHECKSUMS_PATH.write_text("\n".join(lines) + "\n")
+
+
+def asset_url(name: str) -> str:
+    if (DOCS_ASSETS_DIR / name).exists():
+        return f"/static/docs/{name}"
+    return DOCS_ASSETS[name]
+
+
+@dataclass
+class PrecomputedSchema:
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+    @classmethod
+    def load(cls, app: FastAPI) -> "PrecomputedSchema":
+        """Готовая схема из static; если сборки не было — строим один раз в памяти."""
+        try:
+            body = SCHEMA_PATH.read_bytes()
+            gzipped = SCHEMA_PATH.with_suffix(".json.gz").read_bytes()
+        except FileNotFoundError:
+            body = orjson.dumps(app.openapi())
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        return cls(body=body, gzipped=gzipped, etag='"%s"' % hashlib.sha1(body).hexdigest())
+
+
+def build_static(app: FastAPI, vendor_assets: bool) -> None:
+    write_schema(app)
+    if vendor_assets:
+        fetch_docs_assets()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-assets", action="store_true", help="только схема, без Swagger UI и ReDoc")
+    parser.add_argument("--assets-only", action="store_true", help="только ассеты, без схемы")
+    parser.add_argument("--bake", action="store_true", help="только ассеты, в BAKED_ASSETS_DIR (сборка образа)")
+    parser.add_argument("--strict", action="store_true", help="падать, если какой-то ассет не завендорен")
+    parser.add_argument("--pin", action="store_true", help="скачать ассеты и записать их sha256")
+    args = parser.parse_args()
+
+    if args.pin:
+        pin_docs_assets()
+        print(f"checksums: {CHECKSUMS_PATH}")
+        return
+
+    if args.bake:
+        fetch_docs_assets(strict=args.strict, target=BAKED_ASSETS_DIR)
+        print(f"docs assets: {BAKED_ASSETS_DIR}")
+        return
+
+    if args.assets_only:
+        fetch_docs_assets(strict=args.strict)
+    else:
+        from main import main_app
+
+        build_static(main_app, vendor_assets=not args.no_assets)
+        print(f"schema: {SCHEMA_PATH}")
+    for name in DOCS_ASSETS:
+        print(f"{name}: {asset_url(name)}")
+
+
+if __name__ == "__main__":
+    main()
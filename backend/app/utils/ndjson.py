@@ -0,0 +1,16 @@
+from typing import AsyncIterator
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+# Поток не кэшируем (оборванный ответ осел бы в микрокэше nginx)
+# и не даём nginx буферизовать его — строки должны уходить клиенту сразу
+STREAM_HEADERS = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+
+
+def ndjson_response(items: AsyncIterator[dict]) -> StreamingResponse:
+    async def body():
+        async for item in items:
+            yield orjson.dumps(item) + b"\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=STREAM_HEADERS)
@@ -0,0 +1,75 @@
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+# Бенчмарки импортируют модули приложения напрямую, как это делает gunicorn
+sys.path.insert(0, str(APP_DIR))
+os.environ.setdefault("APP_CONFIG__API_KEY_2GIS", "benchmark")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Запускает ASGI-приложение в uvicorn в отдельном потоке."""
+
+    def __init__(self, app, port: int | None = None):
+        self.port = port or free_port()
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def percentile(values: list[float], q: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def stats(latencies: list[float], elapsed: float) -> dict:
+    ms = [v * 1000 for v in latencies]
+    return {
+        "n": len(ms),
+        "rps": len(ms) / elapsed if elapsed else 0.0,
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+    }
+
+
+def format_stats(name: str, result: dict) -> str:
+    return (
+        f"{name:<28} n={result['n']:<6} rps={result['rps']:>9.1f} "
+        f"p50={result['p50']:>7.2f}ms p95={result['p95']:>7.2f}ms "
+        f"p99={result['p99']:>7.2f}ms"
+    )
+
+
+def summary(name: str, latencies: list[float], elapsed: float) -> str:
+    return format_stats(name, stats(latencies, elapsed))
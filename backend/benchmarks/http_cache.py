@@ -0,0 +1,124 @@
+"""
+Объём ответов на проводе и доля запросов, дошедших до бэкенда.
+
+1. Байты по эндпоинтам чтения без сжатия, с gzip в CompressionMiddleware
+   и с заранее сжатым снимком отзывов; время ответа на запрос.
+2. С --nginx-url: поток GET через nginx с микрокэшем, по X-Cache-Status
+   считается, сколько запросов дошло до бэкенда (MISS/EXPIRED/BYPASS).
+
+Запуск из каталога backend:
+    python -m benchmarks.http_cache --reviews 2000 --number 200
+    python -m benchmarks.http_cache --nginx-url http://localhost --duration 30 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+import benchmarks._common  # noqa: F401  (пути и окружение приложения)
+from benchmarks._common import BackgroundServer
+from benchmarks.stub_upstream import StubConfig, create_stub_app
+from api.api_v1.reviews_2gis import router as reviews_router
+from config import settings
+from http_cache import CacheControlMiddleware, CompressionMiddleware
+from http_clients import HttpClients
+from services import ReviewsCache
+
+ENDPOINTS = {
+    "отзывы целиком": ("/api/v1/2gis/five-star-reviews", {}),
+    "отзывы, страница 100": ("/api/v1/2gis/five-star-reviews", {"limit": 100}),
+    "сводка": ("/api/v1/2gis/review-aggregates", {}),
+}
+BACKEND_STATUSES = {"MISS", "EXPIRED", "BYPASS", None}
+
+
+def build_app(compression: bool) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(reviews_router, prefix="/api/v1/2gis")
+    app.add_middleware(CacheControlMiddleware, config=settings.http_cache)
+    if compression:
+        app.add_middleware(CompressionMiddleware, config=settings.http_cache)
+    return app
+
+
+async def measure_bytes(reviews: int, number: int) -> None:
+    with BackgroundServer(create_stub_app(StubConfig(reviews=reviews))) as stub:
+        settings.upstreams.gis = stub.url
+        clients = HttpClients(settings.http)
+        org_id = settings.gis_reviews.orgs[0]
+        cache = ReviewsCache(clients.gis, org_id, settings.reviews_cache)
+        await cache.refresh()
+
+        variants = {
+            "без сжатия": (False, "identity"),
+            "gzip": (True, "gzip"),
+        }
+        print(f"--- отзывов у организации: {reviews}")
+        for name, (path, params) in ENDPOINTS.items():
+            for variant, (compression, encoding) in variants.items():
+                app = build_app(compression)
+                app.state.http_clients = clients
+                app.state.reviews_caches = {org_id: cache}
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    headers = {"Accept-Encoding": encoding}
+                    response = await client.get(path, params=params, headers=headers)
+                    started = time.perf_counter()
+                    for _ in range(number):
+                        # Без распаковки на клиенте: меряем только сервис
+                        async with client.stream("GET", path, params=params, headers=headers) as r:
+                            async for _ in r.aiter_raw():
+                                pass
+                    per_request = (time.perf_counter() - started) / number
+                wire = response.num_bytes_downloaded
+                print(
+                    f"{name:<22} {variant:<11} {wire:>9} байт  "
+                    f"{response.headers.get('content-encoding') or '-':<5} {per_request * 1e3:>7.2f}ms"
+                )
+        await clients.aclose()
+
+
+async def measure_hit_rate(base_url: str, duration: float, concurrency: int) -> None:
+    statuses: Counter[str | None] = Counter()
+    wire_bytes = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal wire_bytes
+        while time.monotonic() < deadline:
+            for path, params in ENDPOINTS.values():
+                response = await client.get(path, params=params, headers={"Accept-Encoding": "gzip"})
+                statuses[response.headers.get("x-cache-status")] += 1
+                wire_bytes += response.num_bytes_downloaded
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+
+    total = sum(statuses.values())
+    backend = sum(n for status, n in statuses.items() if status in BACKEND_STATUSES)
+    print(f"--- nginx {base_url}, {duration:.0f}s, {concurrency} клиентов")
+    print(f"запросов: {total}, до бэкенда: {backend} ({backend / total:.2%}), байт на запрос: {wire_bytes / total:.0f}")
+    for status, n in statuses.most_common():
+        print(f"  {status or '-':<10} {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=2000)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--nginx-url", help="nginx перед сервисом, например http://localhost")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(measure_bytes(args.reviews, args.number))
+    if args.nginx_url:
+        asyncio.run(measure_hit_rate(args.nginx_url, args.duration, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Сравнение задержки запросов в банк с пулом соединений и без него.
+
+Запуск из каталога backend:
+    python -m benchmarks.http_pool --requests 500 --concurrency 20
+
+Заглушка работает по обычному HTTP, поэтому выигрыш здесь — только
+TCP-рукопожатие; на реальном банке добавляется ещё TLS (100–300 мс).
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import BackgroundServer, summary
+from benchmarks.stub_upstream import StubConfig, create_stub_app
+
+from config import UpstreamClientConfig
+from http_clients import build_client
+
+PAYLOAD = {
+    "amount": 100,
+    "transactionID": "bench",
+    "comment": "benchmark",
+    "redirectURL": "https://example.com",
+}
+
+
+async def run(url: str, requests: int, concurrency: int, pooled: bool) -> tuple[list[float], float]:
+    config = UpstreamClientConfig(http2=False, max_keepalive_connections=concurrency)
+    shared = build_client("bank", config) if pooled else None
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            if shared is not None:
+                response = await shared.post(url, json=PAYLOAD)
+            else:
+                async with build_client("bank", config) as client:
+                    response = await client.post(url, json=PAYLOAD)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    if shared is not None:
+        await shared.aclose()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка заглушки, сек")
+    args = parser.parse_args()
+
+    with BackgroundServer(create_stub_app(StubConfig(latency=args.latency))) as server:
+        url = f"{server.url}/api/PayLink/CreatePayLink"
+        for pooled in (False, True):
+            latencies, elapsed = asyncio.run(
+                run(url, args.requests, args.concurrency, pooled)
+            )
+            print(summary("pooled" if pooled else "new client per request", latencies, elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Нагрузочный прогон сервиса против локальной заглушки банка и 2GIS.
+
+Для каждого числа воркеров поднимает сервис через run_main.py (gunicorn),
+гоняет запросы по каждому эндпоинту и печатает p50/p95/p99 и RPS.
+
+Запуск из каталога backend:
+    python -m benchmarks.loadtest --workers 1,2,4 --requests 2000 --concurrency 50
+
+Сравнение профилей запуска (asyncio + h11 без preload против uvloop + httptools):
+    python -m benchmarks.loadtest --profiles baseline,tuned --workers 1,2
+
+Для CI: сохранить результат и сравнить со зафиксированной базой,
+код возврата 1 при регрессии больше --tolerance:
+    python -m benchmarks.loadtest --json result.json --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmarks._common import APP_DIR, format_stats, free_port, stats
+
+BACKEND_DIR = APP_DIR.parent
+
+
+def payment_request(client: httpx.AsyncClient):
+    return client.post("/api/v1/payments/make-payment-link/", json={
+        "amount": 100,
+        "transaction_id": str(uuid.uuid4()),
+        "comment": "loadtest",
+        "redirect_url": "https://example.com",
+        "token": "loadtest",
+    })
+
+
+def qr_request(client: httpx.AsyncClient):
+    return client.post("/api/v1/qr-payments/generate-qr/", json={
+        "account_number": "1240000000000000",
+        "qr_merchant_id": "loadtest",
+        "recipient": "loadtest",
+        "amount": 100,
+        "transaction_id": str(uuid.uuid4()),
+    })
+
+
+def reviews_request(client: httpx.AsyncClient):
+    return client.get("/api/v1/2gis/five-star-reviews")
+
+
+def health_request(client: httpx.AsyncClient):
+    return client.head("/api/v1/health")
+
+
+# Переменные окружения сервиса для каждого профиля запуска
+PROFILES = {
+    "baseline": {
+        "APP_CONFIG__RUN__LOOP": "asyncio",
+        "APP_CONFIG__RUN__HTTP": "h11",
+        "APP_CONFIG__GUNICORN__PRELOAD_APP": "false",
+        "APP_CONFIG__GUNICORN__MAX_REQUESTS": "0",
+    },
+    "tuned": {},
+}
+
+ENDPOINTS = {
+    "payment": payment_request,
+    "qr": qr_request,
+    "reviews": reviews_request,
+    "health": health_request,
+}
+
+
+def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.head(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} не поднялся за {timeout} с")
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.stub_upstream",
+            "--port", str(port),
+            "--latency", str(args.stub_latency),
+            "--jitter", str(args.stub_jitter),
+            "--error-rate", str(args.stub_error_rate),
+        ],
+        cwd=BACKEND_DIR,
+    )
+    wait_ready(f"http://127.0.0.1:{port}/docs")
+    return process
+
+
+def start_service(port: int, workers: int, stub_url: str, workdir: Path, profile: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **PROFILES[profile],
+        "APP_CONFIG__API_KEY_2GIS": "loadtest",
+        "APP_CONFIG__GUNICORN__PORT": str(port),
+        "APP_CONFIG__GUNICORN__WORKERS": str(workers),
+        "APP_CONFIG__LOGGING__LOG_LEVEL": "warning",
+        # Нагрузка идёт с одного токена и IP — лимиты исказили бы замер
+        "APP_CONFIG__RATE_LIMIT__ENABLED": "false",
+        "APP_CONFIG__METRICS__MULTIPROC_DIR": str(workdir / "metrics"),
+        "APP_CONFIG__UPSTREAMS__BANK": stub_url,
+        "APP_CONFIG__UPSTREAMS__QR": stub_url,
+        "APP_CONFIG__UPSTREAMS__QR_TEST": stub_url,
+        "APP_CONFIG__UPSTREAMS__GIS": stub_url,
+    }
+    # Приложение монтирует ./static, поэтому запускаем из временного каталога
+    (workdir / "static").mkdir(exist_ok=True)
+    # Логи сервиса не смешиваем с отчётом — они остаются в service.log
+    log_file = open(workdir / "service.log", "wb")
+    process = subprocess.Popen(
+        [sys.executable, str(APP_DIR / "run_main.py")],
+        cwd=workdir,
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    log_file.close()
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/api/v1/health")
+    except RuntimeError:
+        stop(process)
+        sys.stderr.write((workdir / "service.log").read_text())
+        raise
+    return process
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def run_endpoint(base_url: str, name: str, requests: int, concurrency: int) -> dict:
+    make_request = ENDPOINTS[name]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Прогрев: соединения и кэш отзывов
+        await make_request(client)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await make_request(client)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return {**stats(latencies, elapsed), "errors": errors}
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for run, endpoints in results.items():
+        for name, result in endpoints.items():
+            base = baseline.get(run, {}).get(name)
+            if base is None:
+                continue
+            if result["p99"] > base["p99"] * (1 + tolerance):
+                regressions.append(f"{run} {name}: p99 {base['p99']:.1f} -> {result['p99']:.1f} ms")
+            if result["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(f"{run} {name}: rps {base['rps']:.1f} -> {result['rps']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="числа воркеров через запятую")
+    parser.add_argument("--profiles", default="tuned", help=f"профили через запятую: {', '.join(PROFILES)}")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--stub-latency", type=float, default=0.02)
+    parser.add_argument("--stub-jitter", type=float, default=0.01)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", type=Path, help="куда сохранить результаты")
+    parser.add_argument("--baseline", type=Path, help="результаты прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(",")
+    results: dict[str, dict] = {}
+    stub_port = free_port()
+    stub = start_stub(stub_port, args)
+    try:
+        for profile in args.profiles.split(","):
+            for workers in map(int, args.workers.split(",")):
+                run = f"{profile} workers={workers}"
+                port = free_port()
+                with tempfile.TemporaryDirectory() as workdir:
+                    service = start_service(
+                        port, workers, f"http://127.0.0.1:{stub_port}", Path(workdir), profile,
+                    )
+                    try:
+                        print(f"--- {run}")
+                        for name in endpoints:
+                            result = asyncio.run(run_endpoint(
+                                f"http://127.0.0.1:{port}", name, args.requests, args.concurrency,
+                            ))
+                            results.setdefault(run, {})[name] = result
+                            print(format_stats(name, result) + f" errors={result['errors']}")
+                    finally:
+                        stop(service)
+    finally:
+        stop(stub)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = find_regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
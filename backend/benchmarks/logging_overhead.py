@@ -0,0 +1,121 @@
+"""
+Цена логирования для обработчика запроса.
+
+Сравнивает синхронный StreamHandler с текстовым форматом (как было)
+и очередь ContextQueueHandler + QueueListener с JSON — на быстром
+приёмнике и на медленном, когда stdout не успевает (docker logs, pipe).
+Затем — накладные расходы RequestLogMiddleware с выборкой и без.
+
+Запуск из каталога backend:
+    python -m benchmarks.logging_overhead --number 20000 --sink-delay 0.0002
+"""
+import argparse
+import asyncio
+import io
+import logging
+import time
+
+import benchmarks._common  # noqa: F401  (пути и окружение приложения)
+from benchmarks._common import percentile
+from app_logging import RequestLogMiddleware
+from app_logging.pipeline import LoggingPipeline
+from config import LoggingConfig, settings
+
+
+class SlowStream(io.StringIO):
+    """Приёмник, каждая запись в который блокирует поток на `delay` секунд."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, s: str) -> int:
+        time.sleep(self.delay)
+        return len(s)
+
+
+def time_calls(logger: logging.Logger, number: int) -> list[float]:
+    latencies = []
+    for i in range(number):
+        started = time.perf_counter()
+        logger.info("payment link created", extra={"transaction_id": str(i), "amount": 100})
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    us = [v * 1e6 for v in latencies]
+    print(
+        f"{name:<40} mean={sum(us) / len(us):>8.2f}us  p50={percentile(us, 50):>8.2f}us  "
+        f"p99={percentile(us, 99):>8.2f}us"
+    )
+
+
+def sync_logger(stream) -> logging.Logger:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(settings.logging.log_format))
+    logger = logging.Logger("bench.sync")
+    logger.addHandler(handler)
+    return logger
+
+
+def queue_logger(stream) -> tuple[logging.Logger, LoggingPipeline]:
+    pipeline = LoggingPipeline(LoggingConfig(json_logs=True), stream=stream)
+    logger = logging.Logger("bench.queue")
+    logger.addHandler(pipeline.handler)
+    return logger, pipeline
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def time_requests(asgi, number: int) -> list[float]:
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/health", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    latencies = []
+    for _ in range(number):
+        started = time.perf_counter()
+        await asgi(dict(scope), receive, send)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--sink-delay", type=float, default=0.0002, help="задержка медленного приёмника, с")
+    args = parser.parse_args()
+
+    for sink_name, make_stream in (
+        ("быстрый приёмник", io.StringIO),
+        (f"медленный приёмник {args.sink_delay * 1e6:.0f}us", lambda: SlowStream(args.sink_delay)),
+    ):
+        print(f"--- {sink_name}")
+        report("StreamHandler, текст", time_calls(sync_logger(make_stream()), args.number))
+        logger, pipeline = queue_logger(make_stream())
+        report("QueueHandler + JSON", time_calls(logger, args.number))
+        # Дожидаемся, пока слушатель выпишет очередь, — это не входит в замер
+        pipeline.stop()
+
+    print("--- RequestLogMiddleware")
+    access = logging.getLogger("app.access")
+    access.propagate = False
+    _, pipeline = queue_logger(io.StringIO())
+    access.addHandler(pipeline.handler)
+    report("без middleware", asyncio.run(time_requests(app, args.number)))
+    for rate in (1.0, 0.01):
+        config = LoggingConfig(access_sample_rates={}, access_sample_rate=rate)
+        report(f"access_sample_rate={rate}", asyncio.run(time_requests(RequestLogMiddleware(app, config), args.number)))
+    pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Накладные расходы на запись метрик.
+
+Запуск из каталога backend:
+    python -m benchmarks.metrics_overhead --requests 5000
+
+Режим (один процесс или multiprocess через mmap-файлы) определяется
+настройкой APP_CONFIG__METRICS__MULTIPROC_DIR, как и в приложении.
+"""
+import argparse
+import asyncio
+import os
+import time
+import timeit
+
+import httpx
+from fastapi import FastAPI
+
+import benchmarks._common  # noqa: F401  (пути и окружение приложения)
+from metrics import MetricsMiddleware
+from metrics.registry import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+
+def create_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping/{item_id}")
+    async def ping(item_id: int):
+        return {"ok": True}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/ping/{i}")
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    mode = "multiprocess" if os.environ.get("PROMETHEUS_MULTIPROC_DIR") else "single-process"
+    print(f"mode: {mode}")
+
+    number = 100_000
+    observe = timeit.timeit(
+        lambda: HTTP_REQUEST_DURATION.labels("GET", "/bench").observe(0.01),
+        number=number,
+    )
+    inc = timeit.timeit(
+        lambda: HTTP_REQUESTS.labels("GET", "/bench", "200").inc(),
+        number=number,
+    )
+    print(f"histogram observe: {observe / number * 1e6:.2f} us")
+    print(f"counter inc:       {inc / number * 1e6:.2f} us")
+
+    baseline = asyncio.run(run(create_app(instrumented=False), args.requests))
+    instrumented = asyncio.run(run(create_app(instrumented=True), args.requests))
+    per_request = (instrumented - baseline) / args.requests * 1e6
+    print(f"without middleware: {baseline / args.requests * 1e6:.1f} us/request")
+    print(f"with middleware:    {instrumented / args.requests * 1e6:.1f} us/request")
+    print(f"overhead:           {per_request:.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
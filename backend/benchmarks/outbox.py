@@ -0,0 +1,83 @@
+"""
+Пропускная способность outbox: запись задач в журнал и разбор воркером.
+
+Запуск из каталога backend:
+    python -m benchmarks.outbox --jobs 2000 --concurrency 1,4,16 --latency 0.02
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import benchmarks._common  # noqa: F401  (пути и окружение приложения)
+from config import OutboxConfig
+from services.outbox import Outbox, OutboxJob, OutboxWorker
+
+
+async def enqueue_all(outbox: Outbox, jobs: int) -> float:
+    started = time.perf_counter()
+    for i in range(jobs):
+        await outbox.enqueue(f"bench:{i}", "fp", {"transaction_id": str(i), "amount": 100})
+    return time.perf_counter() - started
+
+
+async def drain(outbox: Outbox, jobs: int, latency: float) -> float:
+    done = asyncio.Event()
+    finished = 0
+
+    async def handler(job: OutboxJob) -> dict:
+        # Имитация ответа банка
+        await asyncio.sleep(latency)
+        return {"pay_url": f"https://pay.example/{job.id}"}
+
+    async def on_finished(job: OutboxJob) -> None:
+        nonlocal finished
+        finished += 1
+        if finished == jobs:
+            done.set()
+
+    worker = OutboxWorker(outbox, handler=handler, on_finished=on_finished)
+    started = time.perf_counter()
+    task = asyncio.create_task(worker.run())
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    task.cancel()
+    return elapsed
+
+
+async def run(args) -> None:
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as tmp:
+            config = OutboxConfig(
+                enabled=True,
+                path=str(Path(tmp) / "outbox.sqlite3"),
+                concurrency=concurrency,
+                poll_interval=0.01,
+            )
+            outbox = Outbox(config)
+            enqueue = await enqueue_all(outbox, args.jobs)
+            elapsed = await drain(outbox, args.jobs, args.latency)
+            compact_started = time.perf_counter()
+            # retention=0: удаляем всё завершённое
+            outbox.config = config.model_copy(update={"retention": 0})
+            await outbox.compact()
+            compact = time.perf_counter() - compact_started
+            outbox.close()
+        print(
+            f"concurrency={concurrency:<3} enqueue={args.jobs / enqueue:>8.0f} jobs/s  "
+            f"drain={args.jobs / elapsed:>8.0f} jobs/s  compact={compact * 1000:>7.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,4,16", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа банка, с")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Время рендера QR и путь попадания в кэш картинок.
+
+Запуск из каталога backend:
+    python -m benchmarks.qr_image --number 200
+"""
+import argparse
+import timeit
+
+import benchmarks._common  # noqa: F401  (пути и окружение приложения)
+from config import settings
+from services.qr_image import ByteLRUCache, image_key, render_qr
+
+# Длина типичной строки EMV QR от банка
+PAYLOAD = "00020101021232" + "9" * 120 + "5303417540510000.006304ABCD"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    cache = ByteLRUCache(max_bytes=settings.qr_image.cache_max_bytes)
+    for fmt in ("png", "svg"):
+        for size in settings.qr_image.sizes:
+            render = timeit.timeit(
+                lambda: render_qr(PAYLOAD, size, fmt, settings.qr_image),
+                number=args.number,
+            ) / args.number
+            image = render_qr(PAYLOAD, size, fmt, settings.qr_image)
+            key = image_key(PAYLOAD, size, fmt)
+            cache.set(key, image)
+            hit = timeit.timeit(
+                lambda: cache.get(image_key(PAYLOAD, size, fmt)),
+                number=args.number * 100,
+            ) / (args.number * 100)
+            print(
+                f"{fmt} {size:>5}px  bytes={len(image):>7}  "
+                f"render={render * 1000:>8.3f}ms  cache_hit={hit * 1e6:>6.2f}us"
+            )
+    print(f"cache size: {cache.size} bytes")
+
+
+if __name__ == "__main__":
+    main()
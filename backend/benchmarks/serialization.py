@@ -0,0 +1,96 @@
+"""
+Сериализация ответов: стандартный путь FastAPI (jsonable_encoder + json)
+против orjson и отдачи тела ответа банка без разбора.
+
+Для каждого варианта — время и объём выделенной памяти (tracemalloc) на запрос.
+
+Запуск из каталога backend:
+    python -m benchmarks.serialization --reviews 1000 --number 200
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+import uuid
+from typing import Callable
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+import benchmarks._common  # noqa: F401  (пути и окружение приложения)
+from benchmarks.stub_upstream import make_reviews
+from services.reviews_2gis import normalize_review
+
+# Ответ QR-сервиса банка в том виде, в каком он приходит по сети
+QR_BODY = json.dumps({
+    "qr_id": str(uuid.uuid4()),
+    "qr_payload": "00020101021232" + "9" * 120 + "5303417540510000.006304ABCD",
+    "transaction_id": str(uuid.uuid4()),
+    "ttl": 3600,
+}).encode()
+
+
+def allocated_per_call(func: Callable[[], object], number: int) -> float:
+    """Сколько байт в среднем выделяется за вызов (включая освобождённые)."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    peak_total = 0
+    for _ in range(number):
+        tracemalloc.reset_peak()
+        func()
+        peak_total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peak_total / number
+
+
+def measure(name: str, func: Callable[[], object], number: int) -> None:
+    seconds = timeit.timeit(func, number=number) / number
+    allocated = allocated_per_call(func, max(1, number // 10))
+    print(f"{name:<44} {seconds * 1e6:>10.1f}us  peak={allocated / 1024:>9.1f}KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    reviews = [normalize_review(r) for r in make_reviews(args.reviews, seed=1)]
+    page = {"5_star_reviews": reviews, "next_cursor": None}
+    print(f"--- отзывы: {len(reviews)} шт.")
+    measure("jsonable_encoder + JSONResponse", lambda: JSONResponse(jsonable_encoder(page)), args.number)
+    measure("jsonable_encoder + ORJSONResponse", lambda: ORJSONResponse(jsonable_encoder(page)), args.number)
+    measure("ORJSONResponse", lambda: ORJSONResponse(page), args.number)
+
+    number = args.number * 50
+    print(f"--- ответ QR: {len(QR_BODY)} байт")
+    measure(
+        "json.loads + jsonable_encoder + JSONResponse",
+        lambda: JSONResponse(jsonable_encoder(json.loads(QR_BODY))),
+        number,
+    )
+    measure("orjson.loads + ORJSONResponse", lambda: ORJSONResponse(orjson.loads(QR_BODY)), number)
+    measure("сырые байты, Response", lambda: Response(QR_BODY, media_type="application/json"), number)
+
+    print("--- пакет из 100 QR")
+    batch = [{"index": i, "status": 200, "result": QR_BODY} for i in range(100)]
+    measure(
+        "json.loads + JSONResponse",
+        lambda: JSONResponse(jsonable_encoder(
+            {"results": [{**item, "result": json.loads(item["result"])} for item in batch]}
+        )),
+        args.number,
+    )
+    measure(
+        "orjson.Fragment + ORJSONResponse",
+        lambda: ORJSONResponse(
+            {"results": [{**item, "result": orjson.Fragment(item["result"])} for item in batch]}
+        ),
+        args.number,
+    )
+
+
+if __name__ == "__main__":
+    main()
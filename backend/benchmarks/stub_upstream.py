@@ -0,0 +1,138 @@
+"""
+Заглушка внешних API: Bakai CreatePayLink, Bakai QR и отзывы 2GIS.
+
+Задержка и ошибки настраиваются, чтобы мерить сервис без реальных банка и 2GIS:
+    python -m benchmarks.stub_upstream --port 9000 --latency 0.05 --error-rate 0.01
+
+Сервис направляется на заглушку через настройки:
+    APP_CONFIG__UPSTREAMS__BANK=http://127.0.0.1:9000
+    APP_CONFIG__UPSTREAMS__QR=http://127.0.0.1:9000
+    APP_CONFIG__UPSTREAMS__QR_TEST=http://127.0.0.1:9000
+    APP_CONFIG__UPSTREAMS__GIS=http://127.0.0.1:9000
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_delay: float = 60.0
+    reviews: int = 500
+    page_size: int = 50
+    seed: int = 0
+
+
+def make_reviews(count: int, seed: int, org_id: str = "") -> list[dict]:
+    rnd = random.Random(f"{seed}:{org_id}" if org_id else seed)
+    reviews = []
+    for i in range(count):
+        # От новых к старым, как сортирует 2GIS при sort_by=date_created
+        day = count - i
+        reviews.append({
+            "id": f"{org_id}{10_000_000 + day}",
+            "rating": rnd.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 4, 12))[0],
+            "text": f"Отзыв номер {day}\nвторая строка",
+            "date_created": f"2024-{1 + day // 28 % 12:02d}-{1 + day % 28:02d}T12:00:00.000000+06:00",
+            "date_edited": None,
+            "user": {"name": f"Пользователь {day}"},
+            "comments_count": rnd.randint(0, 3),
+            "official_answer": {"text": "Спасибо!"} if rnd.random() < 0.3 else None,
+        })
+    return reviews
+
+
+def create_stub_app(config: StubConfig | None = None) -> FastAPI:
+    config = config or StubConfig()
+    org_reviews_data: dict[str, list[dict]] = {}
+    app = FastAPI()
+
+    async def simulate() -> Response | None:
+        """Задержка и внедрение ошибок; возвращает ответ-ошибку или None."""
+        roll = random.random()
+        if roll < config.timeout_rate:
+            await asyncio.sleep(config.timeout_delay)
+        delay = config.latency + random.uniform(0, config.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if roll < config.timeout_rate + config.error_rate:
+            return PlainTextResponse("stub: injected error", status_code=500)
+        return None
+
+    @app.post("/api/PayLink/CreatePayLink", response_class=PlainTextResponse)
+    async def create_pay_link(request: Request):
+        payload = await request.json()
+        if error := await simulate():
+            return error
+        return f"https://pay.example.kg/{payload['transactionID']}"
+
+    @app.post("/api/v1/qr/generate")
+    async def generate_qr(request: Request):
+        payload = await request.json()
+        if error := await simulate():
+            return error
+        return JSONResponse({
+            "qr_id": str(uuid.uuid4()),
+            "qr_payload": f"00020101021232{payload['qr_merchant_id']}5303417540{payload.get('amount', 0)}",
+            "transaction_id": payload.get("transaction_id"),
+            "ttl": payload.get("ttl"),
+        })
+
+    @app.get("/2.0/orgs/{org_id}/reviews")
+    async def org_reviews(
+        request: Request,
+        org_id: str,
+        offset: int = 0,
+        limit: int | None = None,
+        rating: int | None = None,
+    ):
+        if error := await simulate():
+            return error
+        if org_id not in org_reviews_data:
+            org_reviews_data[org_id] = make_reviews(config.reviews, config.seed, org_id)
+        reviews = org_reviews_data[org_id]
+        if rating is not None:
+            reviews = [r for r in reviews if r["rating"] == rating]
+        limit = limit or config.page_size
+        page = reviews[offset:offset + limit]
+        meta = {"org_rating": 4.8, "org_reviews_count": len(reviews)}
+        if offset + limit < len(reviews):
+            meta["next_link"] = str(request.url.include_query_params(offset=offset + limit, limit=limit))
+        return {"reviews": page, "meta": meta}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="базовая задержка, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="доля зависающих запросов")
+    parser.add_argument("--reviews", type=int, default=500)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        reviews=args.reviews,
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Literal
+
+import httpx
+
+TELEGRAM_MAX_LENGTH = 4096
+
+NotificationKind = Literal["opened", "reminder", "resolved", "flapping", "stable"]
+
+
+@dataclass
+class ProbeEvent:
+    target: str
+    title: str
+    ok: bool
+    message: str
+    at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class Notification:
+    target: str
+    kind: NotificationKind
+    text: str
+    redeliveries: int = 0
+
+
+@dataclass
+class Incident:
+    """Состояние одной цели проверки: серии результатов и открытая поломка."""
+
+    target: str
+    title: str
+    ok_streak: int = 0
+    fail_streak: int = 0
+    open: bool = False
+    notified: bool = False
+    opened_at: float = 0.0
+    last_notified_at: float = 0.0
+    failures: int = 0
+    message: str = ""
+    flapping: bool = False
+    transitions: deque[float] = field(default_factory=deque)
+
+
+@dataclass
+class AlertConfig:
+    queue_size: int = 100
+    # Сколько секунд копить уведомления, чтобы отправить их одним сообщением
+    batch_window: float = 5
+    # Поломка открывается после N неудачных проверок подряд, закрывается после M удачных
+    open_after: int = 1
+    resolve_after: int = 1
+    # Напоминание о незакрытой поломке
+    remind_interval: float = 3600
+    # Столько смен состояния за flap_window — цель «мигает», уведомления о ней приостанавливаются
+    flap_threshold: int = 4
+    flap_window: float = 1800
+    max_attempts: int = 5
+    retry_delay: float = 3
+    max_retry_delay: float = 60
+    # Сколько раз возвращать в очередь уведомление, которое Telegram так и не принял
+    max_redeliveries: int = 10
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин"
+    return f"{minutes // 60} ч {minutes % 60} мин"
+
+
+class TelegramSender:
+    """Отправка в Telegram с ретраями; на 429 ждёт `retry_after` из ответа."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        token: str | None,
+        chat_id: str | None,
+        topic_id: str | None,
+        config: AlertConfig,
+    ):
+        self.client = client
+        self.token = token
+        self.chat_id = chat_id
+        self.topic_id = topic_id
+        self.config = config
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.chat_id)
+
+    async def send(self, text: str) -> bool:
+        if not self.configured:
+            logging.warning("Telegram не настроен, уведомление не отправлено", extra={"text": text})
+            return False
+
+        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        payload = {"chat_id": self.chat_id, "text": text}
+        if self.topic_id:
+            payload["message_thread_id"] = self.topic_id
+
+        delay = self.config.retry_delay
+        for attempt in range(1, self.config.max_attempts + 1):
+            try:
+                response = await self.client.post(url, data=payload, timeout=30)
+            except httpx.HTTPError as e:
+                logging.error(
+                    "Не удалось отправить сообщение в Telegram",
+                    extra={"attempt": attempt, "error": str(e)},
+                )
+            else:
+                if response.status_code == 429:
+                    retry_after = self._retry_after(response, delay)
+                    logging.warning(
+                        "Telegram ограничил частоту отправки",
+                        extra={"attempt": attempt, "retry_after": retry_after},
+                    )
+                    await asyncio.sleep(retry_after)
+                    continue
+                if response.is_success:
+                    logging.info("Уведомление отправлено в Telegram")
+                    return True
+                logging.error(
+                    "Telegram отклонил сообщение",
+                    extra={"attempt": attempt, "status": response.status_code, "body": response.text},
+                )
+                if response.status_code < 500:
+                    return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config.max_retry_delay)
+        return False
+
+    @staticmethod
+    def _retry_after(response: httpx.Response, default: float) -> float:
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return default
+
+
+class AlertDispatcher:
+    """
+    Уведомления о проверках, отдельно от самих проверок.
+
+    Проверки только кладут результат в ограниченную очередь (`report` не ждёт).
+    Разбор очереди ведёт состояние поломки по каждой цели: одно уведомление
+    на поломку, напоминание раз в `remind_interval`, подавление «мигающих»
+    целей. Отправка копит уведомления `batch_window` секунд и шлёт их одним
+    сообщением; пока Telegram тормозит, новые уведомления ждут следующей пачки.
+    Недоставленные уведомления возвращаются в очередь, следующая попытка —
+    с нарастающей задержкой.
+    """
+
+    def __init__(self, sender: TelegramSender, config: AlertConfig):
+        self.sender = sender
+        self.config = config
+        self.queue: asyncio.Queue[ProbeEvent] = asyncio.Queue(maxsize=config.queue_size)
+        self.incidents: dict[str, Incident] = {}
+        self._pending: dict[str, Notification] = {}
+        self._has_pending = asyncio.Event()
+
+    def report(self, target: str, title: str, ok: bool, message: str) -> None:
+        try:
+            self.queue.put_nowait(ProbeEvent(target, title, ok, message))
+        except asyncio.QueueFull:
+            # Результаты приходят каждую проверку, следующий восстановит состояние
+            logging.warning("Очередь уведомлений заполнена, результат проверки пропущен", extra={"probe": target})
+
+    async def run(self) -> None:
+        await asyncio.gather(self._consume(), self._deliver())
+
+    async def _consume(self) -> None:
+        while True:
+            event = await self.queue.get()
+            self.handle(event)
+
+    def handle(self, event: ProbeEvent) -> None:
+        incident = self.incidents.get(event.target)
+        if incident is None:
+            incident = self.incidents[event.target] = Incident(event.target, event.title)
+        now = event.at
+        self._check_stable(incident, now)
+
+        if event.ok:
+            incident.ok_streak += 1
+            incident.fail_streak = 0
+            if incident.open and incident.ok_streak >= self.config.resolve_after:
+                self._resolve(incident, now)
+            return
+
+        incident.fail_streak += 1
+        incident.ok_streak = 0
+        incident.message = event.message
+        if incident.open:
+            incident.failures += 1
+            if (
+                incident.notified
+                and not incident.flapping
+                and now - incident.last_notified_at >= self.config.remind_interval
+            ):
+                self._notify(incident, "reminder", (
+                    f"[{incident.title}] ⏳ Всё ещё не работает "
+                    f"({format_duration(now - incident.opened_at)}, проверок с ошибкой: {incident.failures}): "
+                    f"{incident.message}"
+                ), now)
+        elif incident.fail_streak >= self.config.open_after:
+            self._open(incident, now)
+
+    def _open(self, incident: Incident, now: float) -> None:
+        incident.open = True
+        incident.opened_at = now
+        incident.failures = incident.fail_streak
+        self._transition(incident, now)
+        if not incident.flapping:
+            self._notify(incident, "opened", f"[{incident.title}] {incident.message}", now)
+
+    def _resolve(self, incident: Incident, now: float) -> None:
+        incident.open = False
+        self._transition(incident, now)
+        if incident.notified and not incident.flapping:
+            self._notify(incident, "resolved", (
+                f"[{incident.title}] ✅ Проверка восстановилась и работает корректно! "
+                f"Простой: {format_duration(now - incident.opened_at)}"
+            ), now)
+        incident.notified = False
+
+    def _transition(self, incident: Incident, now: float) -> None:
+        transitions = incident.transitions
+        transitions.append(now)
+        while transitions and now - transitions[0] > self.config.flap_window:
+            transitions.popleft()
+        if not incident.flapping and len(transitions) >= self.config.flap_threshold:
+            incident.flapping = True
+            self._notify(incident, "flapping", (
+                f"[{incident.title}] 🔁 Проверка нестабильна: {len(transitions)} смен состояния "
+                f"за {format_duration(self.config.flap_window)}, уведомления приостановлены"
+            ), now)
+
+    def _check_stable(self, incident: Incident, now: float) -> None:
+        if not incident.flapping or (incident.transitions and now - incident.transitions[-1] < self.config.flap_window):
+            return
+        incident.flapping = False
+        incident.transitions.clear()
+        state = f"не работает: {incident.message}" if incident.open else "работает"
+        self._notify(incident, "stable", f"[{incident.title}] Проверка стабилизировалась, сейчас {state}", now)
+        incident.notified = incident.open
+
+    def _notify(self, incident: Incident, kind: NotificationKind, text: str, now: float) -> None:
+        incident.notified = True
+        incident.last_notified_at = now
+        pending = self._pending.get(incident.target)
+        if pending is not None and pending.kind == "opened" and kind == "resolved":
+            # Поломка закрылась раньше, чем о ней успели сообщить
+            del self._pending[incident.target]
+            return
+        self._pending[incident.target] = Notification(incident.target, kind, text)
+        self._has_pending.set()
+
+    async def _deliver(self) -> None:
+        delay = self.config.retry_delay
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self.config.batch_window)
+            batch = list(self._pending.values())
+            self._pending.clear()
+            self._has_pending.clear()
+            failed: list[Notification] = []
+            for text, notifications in self._messages(batch):
+                # После первой неудачи остаток пачки не шлём, а возвращаем в очередь
+                if failed or not await self.sender.send(text):
+                    failed.extend(notifications)
+            if not failed:
+                delay = self.config.retry_delay
+                continue
+            self._requeue(failed)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config.max_retry_delay)
+
+    def _requeue(self, notifications: list[Notification]) -> None:
+        if not self.sender.configured:
+            return
+        for notification in notifications:
+            notification.redeliveries += 1
+            if notification.redeliveries > self.config.max_redeliveries:
+                logging.error("Уведомление не доставлено, повторы исчерпаны", extra={"probe": notification.target})
+                continue
+            newer = self._pending.get(notification.target)
+            if newer is None:
+                self._pending[notification.target] = notification
+            elif notification.kind == "opened" and newer.kind == "resolved":
+                # Пока повторяли, поломка закрылась — не сообщаем ни о той, ни о другом
+                del self._pending[notification.target]
+            # Иначе более свежее уведомление о цели важнее старого
+        if self._pending:
+            self._has_pending.set()
+
+    @staticmethod
+    def _messages(batch: list[Notification]) -> list[tuple[str, list[Notification]]]:
+        """Склеивает уведомления в сообщения не длиннее лимита Telegram."""
+        messages: list[tuple[str, list[Notification]]] = []
+        current, included = "⚠️", []
+        for notification in batch:
+            line = notification.text[:TELEGRAM_MAX_LENGTH - 10]
+            if len(current) + len(line) + 2 > TELEGRAM_MAX_LENGTH:
+                messages.append((current, included))
+                current, included = "⚠️", []
+            current += ("\n\n" if current != "⚠️" else " ") + line
+            included.append(notification)
+        if current != "⚠️":
+            messages.append((current, included))
+        return messages
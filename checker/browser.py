@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from playwright.async_api import Browser, Page, Playwright, async_playwright
+
+
+class BrowserPool:
+    """
+    Один долгоживущий Chromium на весь чекер.
+    Каждая проверка получает свой лёгкий контекст (куки, кэш), а не новый браузер.
+    """
+
+    def __init__(self, max_pages: int = 2):
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+
+    async def _get_browser(self) -> Browser:
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                logging.info("Запуск Chromium")
+                self._browser = await self._playwright.chromium.launch(headless=True)
+            return self._browser
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self._semaphore:
+            browser = await self._get_browser()
+            context = await browser.new_context()
+            try:
+                yield await context.new_page()
+            finally:
+                await context.close()
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
@@ -1,143 +1,147 @@
-import httpx
-import time
-import uuid
-import os
+import asyncio
 import logging
-from playwright.sync_api import sync_playwright
-
-# === Настройка логирования ===
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # Вывод в консоль
-    ]
+import os
+from dataclasses import dataclass, field
+
+import httpx
+
+from alerts import AlertConfig, AlertDispatcher, TelegramSender
+from browser import BrowserPool
+from log_setup import configure_logging, request_id_var
+from probes import (
+    ProbeContext,
+    ProbeFunc,
+    health_probe,
+    payment_probe,
+    qr_probe,
+    reviews_probe,
+    run_probe,
 )
 
+# === Настройка логирования: JSON в stdout из отдельного потока ===
+configure_logging()
+
 # === Настройки ===
 PAYMENT_API_URL = os.getenv("PAYMENT_API_URL")  # URL до вашего backend API
+API_BASE_URL = os.getenv("API_BASE_URL") or (PAYMENT_API_URL or "").split("/api/")[0]
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 TELEGRAM_TOPIC_ID = os.getenv("TELEGRAM_TOPIC_ID")
 PAYMENT_API_TOKEN = os.getenv("PAYMENT_API_TOKEN")
 REDIRECT_URL = os.getenv("REDIRECT_URL", "https://example.com/success")
 
-api_is_broken = False
-check_interval = 300  # стандартный интервал (5 минут)
+# Для QR-проверки нужны реквизиты тестового мерчанта; без них она не запускается
+QR_ACCOUNT_NUMBER = os.getenv("QR_ACCOUNT_NUMBER")
+QR_MERCHANT_ID = os.getenv("QR_MERCHANT_ID")
+QR_RECIPIENT = os.getenv("QR_RECIPIENT", "Health Check")
+
+BROKEN_CHECK_INTERVAL = 60  # пока проверка падает — каждую минуту
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "2"))
+# Полный рендер в браузере — не чаще раза в N секунд, если HTTP-проверка ничего не нашла
+BROWSER_RENDER_INTERVAL = int(os.getenv("BROWSER_RENDER_INTERVAL", "1800"))
+PAY_PAGE_READY_SELECTOR = os.getenv("PAY_PAGE_READY_SELECTOR")
+
+ALERT_CONFIG = AlertConfig(
+    queue_size=int(os.getenv("ALERT_QUEUE_SIZE", "100")),
+    batch_window=float(os.getenv("ALERT_BATCH_WINDOW", "5")),
+    open_after=int(os.getenv("ALERT_OPEN_AFTER", "1")),
+    resolve_after=int(os.getenv("ALERT_RESOLVE_AFTER", "1")),
+    remind_interval=float(os.getenv("ALERT_REMIND_INTERVAL", "3600")),
+    flap_threshold=int(os.getenv("ALERT_FLAP_THRESHOLD", "4")),
+    flap_window=float(os.getenv("ALERT_FLAP_WINDOW", "1800")),
+)
 
 
-def send_telegram_message(message, retries=3, delay=3):
-    """
-    Отправка сообщения в Telegram с ретраями при ошибках.
-    """
-    for attempt in range(retries):
-        try:
-            url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-            payload = {
-                "chat_id": TELEGRAM_CHAT_ID,
-                "text": f"⚠️ {message}"
-            }
-            if TELEGRAM_TOPIC_ID:
-                payload["message_thread_id"] = TELEGRAM_TOPIC_ID
-
-            response = httpx.post(url, data=payload, timeout=30)
-            response.raise_for_status()
-            logging.info("📬 Уведомление отправлено в Telegram")
-            return True
-        except Exception as e:
-            logging.error(f"Не удалось отправить сообщение в Telegram (попытка {attempt+1}): {e}")
-            time.sleep(delay)
-    return False
-
-
-def handle_api_error(msg):
-    global api_is_broken, check_interval
-    if not api_is_broken:
-        send_telegram_message(msg)
-        api_is_broken = True
-        check_interval = 60  # перейти на проверку каждые 1 минуту
-        logging.info("⏱ Переключаем health-check на каждые 1 минуту")
-    logging.error(msg)
-
-
-def check_link(url: str) -> str:
-    """
-    Проверяет ссылку через httpx и Playwright.
-    Возвращает текст результата ("✅" или "❌").
-    """
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        try:
-            page.goto(url, timeout=30000)
-            page.wait_for_timeout(3000)
-            html = page.content().lower()
-        finally:
-            browser.close()
-
-    if any(substr in html for substr in ["app-not-found", "page not found", "assets/404.svg", "error-404"]):
-        return f"{url}: страница не найдена (SPA 404) ❌"
-
-    return f"{url}: страница открывается ✅"
-
-
-def check_api():
-    global api_is_broken, check_interval
-    transaction_id = str(uuid.uuid4())
-    payload = {
-        "amount": "100.00",
-        "transaction_id": transaction_id,
-        "comment": "🚀 Health Check",
-        "redirect_url": REDIRECT_URL,
-        "token": PAYMENT_API_TOKEN
-    }
-    try:
-        response = httpx.post(PAYMENT_API_URL, json=payload, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        pay_url = data.get("pay_url")
-
-        if not pay_url:
-            msg = f"[💳 Ошибка платежной ссылки] ❗ API ответ без 'pay_url'. Код: {response.status_code}, ответ: {data}"
-            handle_api_error(msg)
-            return
+@dataclass
+class Probe:
+    name: str
+    title: str
+    func: ProbeFunc
+    interval: int
 
-        try:
-            result = check_link(pay_url)
-            logging.info(result)
 
-            if "❌" in result:
-                handle_api_error(f"[💳 Ошибка ссылки] {result}")
-                return
+@dataclass
+class ProbeState:
+    broken: bool = False
+    last_timings: dict[str, float] = field(default_factory=dict)
 
-        except Exception as e:
-            handle_api_error(f"[💳 Ошибка проверки ссылки] {e}")
-            return
 
-        if api_is_broken:
-            send_telegram_message("[💳 платежная ссылка] ✅ Платежное API восстановилось и работает корректно!")
-            api_is_broken = False
-            check_interval = 300  # вернуться к 5 минутам
-            logging.info("⏱ Переключаем health-check обратно на каждые 5 минут")
+def build_probes() -> list[Probe]:
+    probes = [
+        Probe("payment", "💳 платежная ссылка", payment_probe, int(os.getenv("PAYMENT_CHECK_INTERVAL", "300"))),
+        Probe("reviews", "⭐ отзывы 2GIS", reviews_probe, int(os.getenv("REVIEWS_CHECK_INTERVAL", "600"))),
+        Probe("health", "❤️ health", health_probe, int(os.getenv("HEALTH_CHECK_INTERVAL", "60"))),
+    ]
+    if QR_ACCOUNT_NUMBER and QR_MERCHANT_ID:
+        probes.append(Probe("qr", "🔳 QR", qr_probe, int(os.getenv("QR_CHECK_INTERVAL", "300"))))
+    return probes
 
-        logging.info(f"[💳 платежная ссылка] ✅ API работает. Ссылка: {pay_url}")
 
-    except httpx.HTTPStatusError as e:
-        msg = f"[💳 Ошибка платежной ссылки] ❌ API вернул ошибку {e.response.status_code}: {e.response.text}"
-        handle_api_error(msg)
-    except (httpx.TimeoutException, httpx.RequestError) as e:
-        msg = f"[💳 Ошибка платежной ссылки] ❌ Ошибка подключения к API: {str(e)}"
-        handle_api_error(msg)
-    except Exception as e:
-        msg = f"[💳 Ошибка платежной ссылки] ❌ Непредвиденная ошибка при проверке API: {str(e)}"
-        handle_api_error(msg)
+async def probe_loop(probe: Probe, ctx: ProbeContext, state: ProbeState, alerts: AlertDispatcher):
+    while True:
+        result = await run_probe(probe.func, ctx)
+        state.last_timings = result.timings
+        fields = {"probe": probe.name, "ok": result.ok, "detail": result.message, "timings": result.timings}
+        # Только кладёт результат в очередь: медленный Telegram не сдвигает следующую проверку
+        alerts.report(probe.name, probe.title, result.ok, result.message)
+
+        if result.ok:
+            logging.info("Проверка пройдена", extra=fields)
+            if state.broken:
+                state.broken = False
+                logging.info("Проверка восстановилась", extra={"probe": probe.name, "interval": probe.interval})
+        else:
+            logging.error("Проверка не прошла", extra=fields)
+            if not state.broken:
+                state.broken = True
+                logging.info("Проверка сломана", extra={"probe": probe.name, "interval": BROKEN_CHECK_INTERVAL})
+
+        await asyncio.sleep(BROKEN_CHECK_INTERVAL if state.broken else probe.interval)
+
+
+async def main():
+    logging.info("Ожидание запуска backend")
+    await asyncio.sleep(10)  # Подождать 10 секунд после старта
+
+    browser = BrowserPool(max_pages=BROWSER_MAX_PAGES)
+    backend_host = httpx.URL(API_BASE_URL).host
+
+    async def propagate_request_id(request: httpx.Request) -> None:
+        request_id = request_id_var.get()
+        if request_id and request.url.host == backend_host:
+            request.headers["X-Request-ID"] = request_id
+
+    async with httpx.AsyncClient(event_hooks={"request": [propagate_request_id]}) as client:
+        ctx = ProbeContext(
+            client=client,
+            browser=browser,
+            api_base_url=API_BASE_URL,
+            payment_api_url=PAYMENT_API_URL,
+            payment_api_token=PAYMENT_API_TOKEN,
+            redirect_url=REDIRECT_URL,
+            qr_request={
+                "account_number": QR_ACCOUNT_NUMBER,
+                "qr_merchant_id": QR_MERCHANT_ID,
+                "recipient": QR_RECIPIENT,
+                "amount": 100,
+            },
+            browser_render_interval=BROWSER_RENDER_INTERVAL,
+            ready_selector=PAY_PAGE_READY_SELECTOR,
+        )
+        alerts = AlertDispatcher(
+            TelegramSender(client, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_TOPIC_ID, ALERT_CONFIG),
+            ALERT_CONFIG,
+        )
+        probes = build_probes()
+        logging.info("Запуск проверок", extra={"intervals": {p.name: p.interval for p in probes}})
+        try:
+            await asyncio.gather(
+                alerts.run(),
+                *(probe_loop(probe, ctx, ProbeState(), alerts) for probe in probes),
+            )
+        finally:
+            await browser.close()
 
 
 if __name__ == "__main__":
-    logging.info("⏳ Ожидание запуска backend...")
-    time.sleep(10)  # Подождать 10 секунд после старта
-    logging.info("🔁 Запуск health-check каждые 5 минут...")
-    while True:
-        check_api()
-        logging.info(f"⏸ Следующая проверка через {check_interval} секунд")
-        time.sleep(check_interval)
+    asyncio.run(main())
@@ -0,0 +1,210 @@
+import asyncio
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterator, Literal
+from urllib.parse import urljoin
+
+import httpx
+
+from browser import BrowserPool
+from log_setup import new_request_id, request_id_var
+
+NOT_FOUND_MARKERS = ["app-not-found", "page not found", "assets/404.svg", "error-404"]
+ASSET_RE = re.compile(r"""(?:src|href)=["']([^"']+\.(?:js|css))(?:\?[^"']*)?["']""", re.IGNORECASE)
+MAX_ASSETS_TO_CHECK = 5
+
+
+@dataclass
+class ProbeResult:
+    ok: bool
+    message: str
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+class Stopwatch:
+    """Замеры этапов одной проверки, в секундах."""
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - started, 3)
+
+
+@dataclass
+class ProbeContext:
+    client: httpx.AsyncClient
+    browser: BrowserPool
+    api_base_url: str
+    payment_api_url: str
+    payment_api_token: str | None
+    redirect_url: str
+    qr_request: dict | None
+    browser_render_interval: int = 1800
+    ready_selector: str | None = None
+    last_render_at: float = 0.0
+
+
+ProbeFunc = Callable[[ProbeContext, Stopwatch], Awaitable[ProbeResult]]
+
+
+@dataclass
+class LinkCheck:
+    verdict: Literal["ok", "suspicious", "broken"]
+    reason: str
+
+
+async def fast_check_link(client: httpx.AsyncClient, url: str) -> LinkCheck:
+    """
+    Дешёвая проверка без браузера: код ответа, оболочка SPA,
+    известные маркеры 404 и доступность первых js/css-ассетов.
+    """
+    response = await client.get(url, follow_redirects=True, timeout=15)
+    if response.status_code >= 400:
+        return LinkCheck("suspicious", f"код ответа {response.status_code}")
+    if "html" not in response.headers.get("content-type", ""):
+        return LinkCheck("suspicious", f"неожиданный content-type {response.headers.get('content-type')}")
+
+    html = response.text.lower()
+    if any(substr in html for substr in NOT_FOUND_MARKERS):
+        return LinkCheck("broken", "маркер 404 в HTML")
+
+    assets = [urljoin(str(response.url), a) for a in ASSET_RE.findall(response.text)][:MAX_ASSETS_TO_CHECK]
+    if not assets:
+        return LinkCheck("suspicious", "в HTML нет оболочки SPA (js/css)")
+    statuses = await asyncio.gather(
+        *(client.head(asset, follow_redirects=True, timeout=10) for asset in assets),
+        return_exceptions=True,
+    )
+    failed = [
+        asset for asset, r in zip(assets, statuses)
+        if isinstance(r, Exception) or r.status_code >= 400
+    ]
+    if failed:
+        return LinkCheck("suspicious", f"недоступны ассеты: {', '.join(failed)}")
+    return LinkCheck("ok", "оболочка SPA и ассеты доступны")
+
+
+async def check_link(browser: BrowserPool, url: str, ready_selector: str | None = None) -> str:
+    """
+    Проверяет ссылку через Playwright.
+    Возвращает текст результата ("✅" или "❌").
+    """
+    async with browser.page() as page:
+        # Ждём, пока SPA догрузит данные, а не фиксированную паузу
+        await page.goto(url, wait_until="networkidle", timeout=30000)
+        if ready_selector:
+            await page.wait_for_selector(ready_selector, timeout=10000)
+        html = (await page.content()).lower()
+
+    if any(substr in html for substr in NOT_FOUND_MARKERS):
+        return f"{url}: страница не найдена (SPA 404) ❌"
+
+    return f"{url}: страница открывается ✅"
+
+
+async def payment_probe(ctx: ProbeContext, watch: Stopwatch) -> ProbeResult:
+    payload = {
+        "amount": "100.00",
+        "transaction_id": str(uuid.uuid4()),
+        "comment": "🚀 Health Check",
+        "redirect_url": ctx.redirect_url,
+        "token": ctx.payment_api_token,
+    }
+    with watch.stage("api"):
+        response = await ctx.client.post(ctx.payment_api_url, json=payload, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    pay_url = data.get("pay_url")
+
+    if not pay_url:
+        return ProbeResult(
+            ok=False,
+            message=f"❗ API ответ без 'pay_url'. Код: {response.status_code}, ответ: {data}",
+        )
+
+    try:
+        with watch.stage("http"):
+            fast = await fast_check_link(ctx.client, pay_url)
+    except httpx.HTTPError as e:
+        fast = LinkCheck("suspicious", f"ошибка загрузки страницы: {e}")
+    if fast.verdict == "broken":
+        return ProbeResult(ok=False, message=f"{pay_url}: {fast.reason} ❌")
+
+    # Браузер — только по расписанию или когда дешёвая проверка что-то заподозрила
+    render_due = time.monotonic() - ctx.last_render_at >= ctx.browser_render_interval
+    if fast.verdict == "ok" and not render_due:
+        return ProbeResult(ok=True, message=f"✅ API работает ({fast.reason}). Ссылка: {pay_url}")
+
+    try:
+        with watch.stage("browser"):
+            result = await check_link(ctx.browser, pay_url, ctx.ready_selector)
+        ctx.last_render_at = time.monotonic()
+    except Exception as e:
+        return ProbeResult(ok=False, message=f"Ошибка проверки ссылки ({fast.reason}): {e}")
+
+    if "❌" in result:
+        return ProbeResult(ok=False, message=result)
+    return ProbeResult(ok=True, message=f"✅ API работает. Ссылка: {pay_url}")
+
+
+async def qr_probe(ctx: ProbeContext, watch: Stopwatch) -> ProbeResult:
+    payload = {**ctx.qr_request, "transaction_id": str(uuid.uuid4())}
+    with watch.stage("api"):
+        response = await ctx.client.post(
+            f"{ctx.api_base_url}/api/v1/qr-payments/generate-qr/",
+            json=payload,
+            timeout=30,
+        )
+    response.raise_for_status()
+    if not response.json():
+        return ProbeResult(ok=False, message=f"❗ Пустой ответ QR-сервиса. Код: {response.status_code}")
+    return ProbeResult(ok=True, message="✅ QR генерируется")
+
+
+async def reviews_probe(ctx: ProbeContext, watch: Stopwatch) -> ProbeResult:
+    with watch.stage("api"):
+        response = await ctx.client.get(
+            f"{ctx.api_base_url}/api/v1/2gis/five-star-reviews",
+            params={"limit": 1},
+            timeout=30,
+        )
+    response.raise_for_status()
+    if "5_star_reviews" not in response.json():
+        return ProbeResult(ok=False, message="❗ В ответе нет '5_star_reviews'")
+    return ProbeResult(ok=True, message="✅ Отзывы отдаются")
+
+
+async def health_probe(ctx: ProbeContext, watch: Stopwatch) -> ProbeResult:
+    with watch.stage("api"):
+        response = await ctx.client.head(f"{ctx.api_base_url}/api/v1/health", timeout=10)
+    response.raise_for_status()
+    return ProbeResult(ok=True, message="✅ backend отвечает")
+
+
+async def run_probe(func: ProbeFunc, ctx: ProbeContext) -> ProbeResult:
+    # Один id на проверку — по нему её запросы находятся в логах backend
+    request_id_var.set(new_request_id())
+    watch = Stopwatch()
+    try:
+        with watch.stage("total"):
+            result = await func(ctx, watch)
+    except httpx.HTTPStatusError as e:
+        result = ProbeResult(
+            ok=False,
+            message=f"❌ API вернул ошибку {e.response.status_code}: {e.response.text}",
+        )
+    except (httpx.TimeoutException, httpx.RequestError) as e:
+        result = ProbeResult(ok=False, message=f"❌ Ошибка подключения к API: {e}")
+    except Exception as e:
+        result = ProbeResult(ok=False, message=f"❌ Непредвиденная ошибка при проверке API: {e}")
+    result.timings = watch.timings
+    return result